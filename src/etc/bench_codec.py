@@ -0,0 +1,79 @@
+# bench_codec.py  (c)2026  Henrique Moreira
+
+""" Benchmark JSON codecs: reference (json) versus accelerated (orjson)
+"""
+
+# pylint: disable=missing-function-docstring
+
+import sys
+import time
+from jdba import jcodec
+
+def main():
+    rows = int(sys.argv[1]) if sys.argv[1:] else 100000
+    is_ok = do_bench(rows)
+    assert is_ok, "bench"
+    return 0
+
+def sample_box(rows:int) -> dict:
+    cases = [
+        {
+            "Id": 1000 + idx,
+            "Key": f"key-{idx % 97}",
+            "Mark": f"2022-{1 + idx % 12:02d}-{1 + idx % 28:02d}",
+            "Title": f"São Paulo #{idx}",
+            "Value": idx * 0.25,
+        } for idx in range(1, rows + 1)
+    ]
+    cases.append({"Id": 0, "Key": "", "Mark": None, "Title": "", "Value": 0.0})
+    return {
+        "!bench.json": [{"Id": 0, "Title": "bench"}],
+        "bench=$1": cases,
+        "~": [{"Id": -1}],
+    }
+
+def wide_box() -> dict:
+    """ Integers orjson cannot decode as such """
+    return {
+        "wide=$1": [
+            {"Id": 1001, "Value": 2 ** 64},
+            {"Id": 1002, "Value": -2 ** 63 - 1},
+            {"Id": 1003, "Value": 10 ** 30},
+            {"Id": 0, "Value": 2 ** 64 - 1},
+        ],
+    }
+
+def timed(func, *args) -> tuple:
+    start = time.perf_counter()
+    res = func(*args)
+    return res, time.perf_counter() - start
+
+def do_bench(rows:int) -> bool:
+    data = sample_box(rows)
+    names = ["json"] + (["orjson"] if jcodec.orjson is not None else [])
+    ref = ""
+    for name in names:
+        codec = jcodec.CODECS[name]()
+        astr, t_enc = timed(codec.dumps, data)
+        back, t_dec = timed(codec.loads, astr)
+        if not ref:
+            ref = astr
+        assert astr == ref, f"{name}: output differs from reference"
+        assert back == data, name
+        mbytes = len(astr) / 1e6
+        print(
+            f"{name:8} {mbytes:.1f} MB; "
+            f"encode {t_enc:.3f}s ({mbytes / t_enc:.1f} MB/s), "
+            f"decode {t_dec:.3f}s ({mbytes / t_dec:.1f} MB/s)"
+        )
+    wide = wide_box()
+    for name in names:
+        codec = jcodec.CODECS[name]()
+        astr = codec.dumps(wide)
+        back = codec.loads(astr)
+        assert back == wide and codec.dumps(back) == astr, f"{name}: wide integers"
+        assert codec.loads(astr.encode("ascii")) == wide, f"{name}: wide integers (bytes)"
+    return True
+
+if __name__ == "__main__":
+    main()
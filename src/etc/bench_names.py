@@ -0,0 +1,72 @@
+# bench_names.py  (c)2026  Henrique Moreira
+
+""" Benchmark Id hashing (record names) of wide cases:
+first indexing, and re-indexing with memoized names.
+"""
+
+# pylint: disable=missing-function-docstring
+
+import sys
+import time
+from jdba import jindex
+from jdba.jindex import JIndex
+
+FIELDS = 12
+
+
+def main():
+    rows = int(sys.argv[1]) if sys.argv[1:] else 100000
+    is_ok = do_bench(rows)
+    assert is_ok, "bench"
+    return 0
+
+def sample_case(rows:int) -> list:
+    res = []
+    for idx in range(1, rows + 1):
+        item = {f"Field{col:02d}": f"value {idx % (col + 7)}" for col in range(FIELDS)}
+        item["Id"] = 1000 + idx
+        item["Mark"] = f"2022-{1 + idx % 12:02d}-{1 + idx % 28:02d}"
+        item["Count"] = idx
+        res.append(item)
+    res.append({"Id": 0})
+    return res
+
+def plain_name(dct, j_strip=True):
+    """ Record name, as computed before memoizing (sorting each record keys) """
+    if "Name" in dct:
+        return "Name", dct["Name"]
+    tics, keying = [], []
+    for key in sorted(dct):
+        if key == "Id":
+            continue
+        aval = dct[key]
+        if isinstance(aval, (str, float, int)):
+            keying.append(key)
+            tics.append(f"{aval}")
+    astr = '|'.join(tics)
+    if j_strip:
+        astr = astr.rstrip('|')
+    return '+'.join(keying), astr
+
+def timed_hash(ixr, acase:str, data:list) -> float:
+    start = time.perf_counter()
+    ixr._hash_case(ixr.id_hash(), acase, data)	# pylint: disable=protected-access
+    return time.perf_counter() - start
+
+def do_bench(rows:int) -> bool:
+    acase = "bench"
+    data = sample_case(rows)
+    plain = JIndex("plain")
+    plain._best_name = plain_name	# pylint: disable=protected-access
+    elapsed = timed_hash(plain, acase, data)
+    print(f"sorted keys    {rows} rows: {elapsed:.3f}s")
+    ixr = JIndex("bench")
+    jindex.KEY_ORDERS.clear()
+    first = timed_hash(ixr, acase, data)
+    print(f"key order      {rows} rows: {first:.3f}s, x{elapsed / first:.1f}")
+    again = timed_hash(ixr, acase, data)
+    print(f"memoized names {rows} rows: {again:.3f}s, x{elapsed / again:.1f}")
+    return ixr.id_hash() == plain.id_hash()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# bench_rows.py  (c)2026  Henrique Moreira
+
+""" Benchmark compact rows versus dictionaries: memory and access speed
+"""
+
+# pylint: disable=missing-function-docstring
+
+import sys
+import time
+import tracemalloc
+from jdba.jbox import JBox
+
+def main():
+    rows = int(sys.argv[1]) if sys.argv[1:] else 200000
+    is_ok = do_bench(rows)
+    assert is_ok, "bench"
+    return 0
+
+def sample_case(rows:int) -> list:
+    res = [
+        {
+            "Id": 1000 + idx,
+            "Key": f"key-{idx}",
+            "Mark": f"2022-{1 + idx % 12:02d}-{1 + idx % 28:02d}",
+            "Title": f"title {idx}",
+        } for idx in range(1, rows + 1)
+    ]
+    res.append({"Id": 0, "Key": "", "Mark": None, "Title": ""})
+    return res
+
+def build(rows:int, packed:bool) -> tuple:
+    tracemalloc.start()
+    box = JBox({"!bench.json": [{"Id": 0}], "bench=$1": sample_case(rows)}, "bench")
+    box.dlist = None
+    if packed:
+        box.pack_rows()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return box, size
+
+def access(case:list) -> float:
+    start = time.perf_counter()
+    total = 0
+    for item in case:
+        total += item["Id"]
+        if item.get("Mark") == "2022-06-04":
+            total += 1
+    return time.perf_counter() - start
+
+def do_bench(rows:int) -> bool:
+    shown = {}
+    for packed in (False, True):
+        box, size = build(rows, packed)
+        case = box.raw()["bench=$1"]
+        elapsed = min(access(case) for _ in range(3))
+        name = "rows" if packed else "dicts"
+        shown[name] = size
+        print(f"{name:6} {rows} rows: {size / 1e6:.1f} MB, access {elapsed:.3f}s")
+        del box, case
+    print(f"Memory ratio: {shown['rows'] / shown['dicts']:.2f}")
+    return True
+
+if __name__ == "__main__":
+    main()
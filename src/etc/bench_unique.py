@@ -0,0 +1,75 @@
+# bench_unique.py  (c)2026  Henrique Moreira
+
+""" Benchmark uniqueness validation: one pass per field, versus
+all fields (and composite keys) in a single pass.
+"""
+
+# pylint: disable=missing-function-docstring
+
+import sys
+import time
+from jdba import strict
+
+FIELDS = ["Key", "Title"]
+
+
+def main():
+    rows = int(sys.argv[1]) if sys.argv[1:] else 1000000
+    is_ok = do_bench(rows)
+    assert is_ok, "bench"
+    return 0
+
+def sample_case(rows:int) -> list:
+    res = [
+        {
+            "Id": 1000 + idx,
+            "Key": f"key-{idx}",
+            "Mark": f"2022-{1 + idx % 12:02d}-{1 + idx % 28:02d}",
+            "Title": f"title {idx}",
+        } for idx in range(1, rows + 1)
+    ]
+    res.append({"Id": 0, "Key": "", "Mark": None, "Title": ""})
+    return res
+
+def per_field(elems, acase:str, fields) -> str:
+    """ As before: one pass per field """
+    for field in fields:
+        used = {}
+        for item in elems:
+            if item["Id"] < 1:
+                continue
+            fld_val = item[field]
+            if fld_val in used:
+                return f"Duplicate {field}='{fld_val}' ({item['Id']}); {used[fld_val]}"
+            used[fld_val] = item
+    return ""
+
+def timed(func, *args) -> tuple:
+    start = time.perf_counter()
+    res = func(*args)
+    return res, time.perf_counter() - start
+
+def do_bench(rows:int) -> bool:
+    elems = sample_case(rows)
+    quad = ("bench", "bench", 2, None)
+    msg, elapsed = timed(per_field, elems, "bench", FIELDS)
+    print(f"per field     {rows} rows, {FIELDS}: {elapsed:.3f}s")
+    assert msg == "", msg
+    msg, elapsed = timed(strict.validate_fields_uq, elems, quad, FIELDS)
+    print(f"single pass   {rows} rows, {FIELDS}: {elapsed:.3f}s")
+    assert msg == "", msg
+    composite = FIELDS + [["Key", "Mark"]]
+    msg, elapsed = timed(strict.validate_fields_uq, elems, quad, composite)
+    print(f"single pass   {rows} rows, {composite}: {elapsed:.3f}s")
+    assert msg == "", msg
+    elems[rows // 2] = dict(elems[rows // 3], Id=elems[rows // 2]["Id"])
+    msg, elapsed = timed(strict.validate_fields_uq, elems, quad, composite)
+    print(f"duplicates    {rows} rows: {elapsed:.3f}s, {msg[:70]}...")
+    assert msg, "Expected duplicate"
+    elems[rows // 2] = elems[rows // 3]
+    msg, elapsed = timed(strict.validate_uniqueness, elems, quad, 0)
+    print(f"whole records {rows} rows: {elapsed:.3f}s, {msg[:70]}...")
+    return msg != ""
+
+if __name__ == "__main__":
+    main()
@@ -10,9 +10,33 @@ each 'case' designates one list of dictionaries.
 
 import os
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import jdba.jcommon
-from jdba.jbox import JBox
+from jdba.jbox import JBox, read_box, write_synced, commit_staged, sync_dir
+from jdba.jbox import TMP_SUFFIX, LOG_SUFFIX
 from jdba.strict import StrictSchema
+from jdba.jpool import ValuePool
+from jdba.jjoin import Side, Join
+from jdba.jpattern import PatternIndex
+from jdba import jvalfile
+from jdba import jixfile
+
+DEF_OPTIONS = {
+    "lazy": False,	# True: boxes are loaded only on first access
+    "workers": 0,	# >0: eager loading uses a pool of workers
+    "pool": "thread",	# 'thread' or 'process' (for very large boxes)
+    "journal": False,	# True: multi-box saves are all-or-nothing
+    "log": False,	# True: boxes log changes instead of being rewritten
+    "cache": False,	# True: boxes are reopened from binary snapshots
+    "compact": False,	# True: homogeneous cases are stored as compact rows
+    "intern": False,	# True: keys and repeated values are shared by all boxes
+    "indexes": False,	# True: computed indexes are persisted next to boxes
+    "valcache": False,	# True: validation results are persisted, see jvalfile
+    "vpool": "process",	# validation_report() pool: checks are CPU-bound (GIL)
+}
+
+JOURNAL_NAME = "jdb.journal"
 
 class GenDatabase(jdba.jcommon.GenericData):
     """ Generic database operations
@@ -24,6 +48,10 @@ class GenDatabase(jdba.jcommon.GenericData):
         self._auto_validate = False
         self._validate_before_save = True
         self._msg = ""
+        self._opts = dict(DEF_OPTIONS)
+
+    def options(self) -> dict:
+        return self._opts
 
     def message(self) -> str:
         return self._msg
@@ -31,11 +59,22 @@ class GenDatabase(jdba.jcommon.GenericData):
 class Database(GenDatabase):
     """ (JSON) Database handling
     """
-    def __init__(self, path, name="", encoding=None, has_schema=True):
+    def __init__(self, path, name="", encoding=None, has_schema=True, opts=None):
         super().__init__(name, encoding)
+        if opts:
+            assert isinstance(opts, dict), name
+            for key in opts:
+                assert key in DEF_OPTIONS, f"Invalid option: {key}"
+            self._opts.update(opts)
         self._path = path
+        self._timings = {}
+        self._pool = ValuePool(self.name) if self._opts["intern"] else None
+        self._patterns = None
+        self._validated = {}
+        self._keys = {}		# memoized content keys of files not loaded, see jixfile
         self._init_schema = {} if has_schema else None
         self._schema, self._names, self._paths = self._initializer(path)
+        self._recovered = self._recover_journal()
         self._index = self._reload()
         self.default_box = ""
         #self._reclassify = True  # -- uncomment if you changed schema, and
@@ -43,7 +82,7 @@ class Database(GenDatabase):
         if self._reclassify:
             self._schema.saver()
         if self._auto_validate:
-            self._msg = self._schema.validate(self._index)
+            self._msg = self._validate_schema()
 
     def path_refs(self) -> dict:
         return {} if self._msg else self._paths
@@ -69,20 +108,51 @@ class Database(GenDatabase):
         assert tname, self.name
         return tbl
 
+    def load_timings(self) -> dict:
+        """ Returns the time (in seconds) spent loading each box. """
+        return self._timings
+
+    def value_pool(self):
+        """ Returns the database value pool (None, unless option 'intern' is set). """
+        return self._pool
+
+    def resident(self) -> list:
+        """ Returns the (sorted) names of the boxes already loaded. """
+        tables = self.tables()
+        if isinstance(tables, LazyTables):
+            return tables.resident()
+        return sorted(tables)
+
     def schema(self):
         """ Returns database schema class instance. """
         assert self._schema, self.name
         return self._schema
 
-    def valid_schema(self, debug=0) -> bool:
-        """ Returns True if boxes are according to the schema. """
-        msg = self._validate_schema()
+    def valid_schema(self, debug=0, cold=False) -> bool:
+        """ Returns True if boxes are according to the schema.
+        :param cold: True to check all cases, not only those changed since last check.
+        """
+        msg = self._validate_schema(cold=cold)
         if debug > 0:
-            print(f"Debug: valid_schema(): {msg if msg else 'OK'}")
+            print(f"Debug: valid_schema(): {msg if msg else 'OK'}", self._validated)
         if msg:
             self._msg = msg
         return msg == ""
 
+    def validation_state(self) -> dict:
+        """ Returns, for each box of the last successful validation,
+        either 'validated', or 'validated (cached)' when it was skipped
+        because its content did not change (option 'valcache').
+        """
+        return self._validated
+
+    def validation_report(self, workers=None) -> list:
+        """ Returns all violations of the schema (see StrictSchema.report()),
+        using the 'workers' (default: database option) and 'vpool' options.
+        """
+        num = self._opts["workers"] if workers is None else workers
+        return self.schema().report(self.get_indexes(), num, self._opts["vpool"])
+
     def index_all(self) -> list:
         """ Use existing schema to 'do_id_hash()' in all dlist.index(es).
         Returns a list with indication of the unique indexes ('u-id').
@@ -100,11 +170,125 @@ class Database(GenDatabase):
                     assert ala["Method"] is None, acase
                     #print(":::", tup["Key"], acase, ala, end="\n\n")
                     str_info = f'{box}.{acase}'
-                    ixr = self.table(box).dlist.index
-                    ixr.do_id_hash()
+                    dlist = self.table(box).dlist
+                    if not dlist.index.initialized():
+                        dlist.do_index()
+                    ixr = dlist.index
+                    if not (self._opts["indexes"] and ixr.id_hash()):
+                        ixr.do_id_hash()
                     res.append((str_info, ixr.id_hash()))
+        _, built = self._index_fields()
+        if self._opts["indexes"]:
+            self.save_indexes(built)
+        return res
+
+    def save_indexes(self, force=()) -> list:
+        """ Persists computed indexes of (unchanged) loaded boxes.
+        :param force: boxes to persist even if their sidecar was valid
+        Returns the list of boxes whose indexes were written.
+        """
+        res = []
+        for key in self.resident():
+            box = self.table(key)
+            if box.index_persisted() and key not in force:
+                continue
+            if box.save_index():
+                res.append(key)
         return res
 
+    def index_fields(self) -> list:
+        """ Builds secondary indexes declared in the schema, e.g. box entry:
+		"Indexes": [{"Id": 1, "Case": "sample", "Fields": ["Mark"], "Kind": "hash"}]
+        Returns the list of 'box.case:fields' built.
+        """
+        res, _ = self._index_fields()
+        return res
+
+    def _index_fields(self) -> tuple:
+        """ Returns the list of 'box.case:fields', and the set of boxes
+        with new (not already built) indexes.
+        """
+        res, built = [], set()
+        for tup in self._schema.inlist:
+            box = tup["Key"]
+            for spec in tup.get("Indexes", []):
+                if spec["Id"] < 1:
+                    continue
+                acase, fields = spec["Case"], spec["Fields"]
+                dlist = self.table(box).dlist
+                if not dlist.index.initialized():
+                    dlist.do_index()
+                kind = spec.get("Kind", "hash")
+                fix = dlist.index.field_index(acase, fields, kind)
+                if fix is None:
+                    fix = dlist.index.add_field_index(acase, fields, kind)
+                    built.add(box)
+                res.append(f"{box}.{acase}:{fix.spec()}")
+        return res, built
+
+    def find(self, box:str, acase:str, **values) -> list:
+        """ Returns the records of box/case with the given field values. """
+        return self.table(box).dlist.find(acase, **values)
+
+    def query(self, box:str, acase:str):
+        """ Returns a query on box/case, see jquery.Query """
+        return self.table(box).dlist.query(acase)
+
+    def search(self, box:str, acase:str, text:str, mode:str="and") -> list:
+        """ Returns (record, score) pairs of box/case matching words of 'text' """
+        return self.table(box).dlist.search(acase, text, mode)
+
+    def aggregate(self, box:str, acase:str, by=(), **aggs) -> list:
+        """ Returns aggregations per group of box/case, see jgroup.group_by() """
+        return self.table(box).dlist.aggregate(acase, by, **aggs)
+
+    def patterns(self, refresh=False):
+        """ Returns the index of case templates of all boxes, see jpattern. """
+        if self._patterns is None or refresh:
+            pix = PatternIndex(self.name)
+            for box in self.table_names():
+                pix.add_box(box, self.table(box).raw())
+            self._patterns = pix
+        return self._patterns
+
+    def match_url(self, text:str) -> list:
+        """ Returns (box, case, record) triplets for 'text' (e.g. a URL):
+        the case template matches 'text', and the record has 'text',
+        or one of the captured values, as a string field value.
+        A matching case without such records gives a single triplet with record None.
+        """
+        res = []
+        for box, acase, captures in self.patterns().match(text):
+            dlist = self.table(box).dlist
+            dlist.get_case_root(acase)
+            found = {}
+            for aval in [text] + [captures[num] for num in sorted(captures)]:
+                for item in dlist.index.find_value(acase, aval):
+                    # By record, not by Id: Ids of a case may be duplicate
+                    found.setdefault(id(item), item)
+            if not found:
+                res.append((box, acase, None))
+            res += [
+                (box, acase, item) for item in sorted(found.values(), key=lambda item: item["Id"])
+            ]
+        return res
+
+    def join(self, left:tuple, right:tuple, on, right_on=None, how:str="inner"):
+        """ Returns a (streaming) join of two cases, each as (box, case), e.g.
+		join(("other", "sample"), ("yes", "youtube-index"), "Key", right_on="Title")
+        Fields declared unique in the schema are hashed to single records.
+        """
+        right_on = on if right_on is None else right_on
+        sides = []
+        for (box, acase), fields in ((left, on), (right, right_on)):
+            uqs = self._schema.unique_fields(box, acase)
+            sides.append(Side(self.table(box).dlist, acase, fields, uqs))
+        return Join(sides[0], sides[1], how)
+
+    def find_range(self, box:str, acase:str, field, low=None, high=None) -> list:
+        """ Returns the records of box/case with 'field' between low and high. """
+        return self.table(box).dlist.find_range(acase, field, low, high)
+
     def basic_ok(self) -> bool:
         """ Returns True if everything is basically ok. """
         return self._msg == ""
@@ -120,10 +304,11 @@ class Database(GenDatabase):
 
     def save(self, name:str="", debug=0) -> bool:
         """ Saves table(s): if name provided, saves only the corresponding table.
+        In lazy mode, boxes never loaded are left untouched.
         """
         msg = "; no check"
         if self._validate_before_save:
-            msg = self._validate_schema()
+            msg = self._validate_schema(self.resident())
             if msg:
                 self._msg = msg
                 return False
@@ -155,8 +340,13 @@ class Database(GenDatabase):
             if debug > 0:
                 print(f"Saving {name} at: {path}")
             return self.table(name).save(path), "", []
+        if self._opts["journal"]:
+            return self._save_journaled(debug)
+        resident = self.resident()
         for tname in sorted(self._paths):
             assert tname, self.name
+            if tname not in resident:
+                continue
             is_ok, _, _ = self._save_tables(tname, debug)
             if not is_ok:
                 if not failed:
@@ -169,6 +359,73 @@ class Database(GenDatabase):
             return False, failed, fails
         return True, "", saves
 
+    def _save_journaled(self, debug) -> tuple:
+        """ Saves all (resident) boxes at once:
+        changed boxes are staged first, then a journal lists the renames,
+        and only then the renames are done.
+        A crash before the journal is written leaves all boxes unchanged;
+        a crash after is completed upon the next open (see _recover_journal()).
+        """
+        staged, fails = [], []
+        for tname in self.resident():
+            path = self._paths[tname]
+            try:
+                tmp = self.table(tname).stage(path)
+            except FileNotFoundError:
+                fails.append(tname)
+                continue
+            staged.append((tname, tmp, path))
+        if fails:
+            for _, tmp, _ in staged:
+                if tmp:
+                    os.remove(tmp)
+            self._msg = f"Failed Save(s): {'; '.join(fails)}"
+            return False, fails[0], fails
+        renames = [[tmp, tmp[:-len(TMP_SUFFIX)]] for _, tmp, _ in staged if tmp]
+        jpath = self._journal_path()
+        if renames:
+            astr = json.dumps(renames, indent=2) + "\n"
+            write_synced(jpath + TMP_SUFFIX, astr.encode("ascii"))
+            commit_staged(jpath + TMP_SUFFIX, jpath)
+            if debug > 0:
+                print("Journal:", jpath, renames)
+        for tname, tmp, path in staged:
+            self.table(tname).commit(tmp, path)
+        if renames:
+            os.remove(jpath)
+            sync_dir(os.path.dirname(jpath))
+        saves = [tname for tname, tmp, _ in staged if tmp]
+        return True, "", saves
+
+    def _journal_path(self) -> str:
+        adir = self._path
+        if not os.path.isdir(adir):
+            adir = os.path.dirname(os.path.realpath(adir))
+        return os.path.join(adir, JOURNAL_NAME)
+
+    def _recover_journal(self) -> list:
+        """ Completes an interrupted journaled save, if any;
+        stale staged files, never committed, are discarded.
+        Returns the list of recovered box paths.
+        """
+        jpath = self._journal_path()
+        renames = []
+        if os.path.isfile(jpath):
+            with open(jpath, "r", encoding="ascii") as fdin:
+                renames = json.load(fdin)
+        res = []
+        for tmp, path in renames:
+            if os.path.isfile(tmp):
+                commit_staged(tmp, path)
+            res.append(path)
+        if renames:
+            os.remove(jpath)
+        for path in self._paths.values():
+            for stale in (path + TMP_SUFFIX, path + LOG_SUFFIX + TMP_SUFFIX):
+                if os.path.isfile(stale):
+                    os.remove(stale)
+        return res
+
     def complain_err(self, msg, opt):
         if opt:
             print(f"{msg}: {opt}")
@@ -217,11 +474,81 @@ class Database(GenDatabase):
             tname = self.default_box if self.default_box else names[0]
         return tname, self._index["tables"][tname][1]
 
-    def _validate_schema(self) -> str:
-        """ Validates boxes against schema. Returns empty if all ok. """
-        msg = self.schema().validate(self.get_indexes())
+    def _validate_schema(self, names=None, cold=False) -> str:
+        """ Validates boxes against schema. Returns empty if all ok.
+        :param names: validate only these boxes (default: all)
+        :param cold: True to check all cases, see StrictSchema.validate()
+        """
+        ndexing = self.get_indexes()
+        if names is not None:
+            ndexing = {
+                "tables": {key: ndexing["tables"][key] for key in names},
+                "indexes": ndexing["indexes"],
+            }
+        use_cache = self._opts["valcache"] and os.path.isfile(self.schema().schema_path())
+        cached = self._cached_valid(ndexing) if use_cache and not cold else {}
+        msg = self.schema().validate(ndexing, cold=cold, skip=cached)
+        if msg:
+            self._validated = {}
+            return msg
+        self._validated = {
+            key: "validated (cached)" if key in cached else "validated"
+            for key in ndexing["tables"]
+        }
+        if use_cache:
+            self._store_valid(ndexing, cached)
         return msg
 
+    def _cached_valid(self, ndexing) -> dict:
+        """ Returns the keys of the boxes whose persisted validation still holds. """
+        stored = jvalfile.fetch(self._db_dir())
+        if not stored:
+            return {}
+        skey = jixfile.memo_key(self.schema().schema_path(), self._keys)
+        res = {}
+        for tname in ndexing["tables"]:
+            if tname not in stored:
+                continue
+            key = self._valid_key(skey, tname)
+            if key is not None and key == stored[tname]:
+                res[tname] = key
+        return res
+
+    def _store_valid(self, ndexing, cached:dict) -> bool:
+        """ Persists the keys of the boxes just validated (unchanged ones only). """
+        keys = jvalfile.fetch(self._db_dir())
+        skey = jixfile.memo_key(self.schema().schema_path(), self._keys)
+        new = dict(keys)
+        for tname in ndexing["tables"]:
+            if tname in cached:
+                continue
+            key = self._valid_key(skey, tname)
+            if key is not None:
+                new[tname] = key
+        if new == keys:
+            return False
+        return jvalfile.store(self._db_dir(), new)
+
+    def _valid_key(self, skey:tuple, tname:str):
+        """ Returns the validation key of a box, or None if it (or a box it
+        references) was changed in memory.
+        """
+        keys = []
+        for key in [tname] + self.schema().box_refs().get(tname, []):
+            if key not in self._paths:
+                return None
+            tup = dict.get(self.tables(), key)
+            if tup is None:
+                keys.append(jixfile.memo_key(self._paths[key], self._keys))
+            elif tup[1].is_dirty():
+                return None
+            else:
+                keys.append(tup[1].content_key())
+        return jvalfile.valid_key(skey, keys[0], keys[1:])
+
+    def _db_dir(self) -> str:
+        return os.path.dirname(self.schema().schema_path())
+
     def corrected(self) -> bool:
         if not self._msg:
             return False
@@ -229,32 +556,130 @@ class Database(GenDatabase):
         return True
 
     def _reload(self) -> dict:
+        is_lazy = self._opts["lazy"]
         res = {
-            "tables": {},
+            "tables": LazyTables(self._load_box) if is_lazy else {},
             "indexes": {},
         }
         boxes = self._schema.inlist
         if not boxes:
             return res
-        for box in boxes:
-            an_id, key = box["Id"], box["Key"]
-            path = self._paths[key]
-            assert an_id, key
-            new = JBox(name=f"{an_id}:{key}")
-            assert key not in res["tables"], key
-            is_ok = new.load(path)
-            res["tables"][key] = (new.dlist, new, int(is_ok))
+        keys = [box["Key"] for box in boxes]
+        assert len(set(keys)) == len(keys), f"Duplicate box(es): {keys}"
+        if is_lazy:
+            for key in keys:
+                res["tables"].declare(key)
+            return res
+        if self._opts["workers"] > 0:
+            res["tables"] = self._parallel_load(keys)
+            return res
+        for key in keys:
+            res["tables"][key] = self._load_box(key)
         return res
 
+    def _load_box(self, key:str) -> tuple:
+        """ Loads one box; returns the triplet (dlist, box, ok-code) """
+        start = time.perf_counter()
+        new = self._new_box(key)
+        is_ok = new.load(self._paths[key])
+        if is_ok and self._opts["indexes"]:
+            new.load_index()
+        self._timings[key] = time.perf_counter() - start
+        return new.dlist, new, int(is_ok)
+
+    def _new_box(self, key:str):
+        an_id = self._box_ids()[key]
+        assert an_id, key
+        new = JBox(name=f"{an_id}:{key}")
+        new.set_log(self._opts["log"])
+        new.set_cache(self._opts["cache"])
+        new.set_packing(self._opts["compact"])
+        new.set_pool(self._pool)
+        return new
+
+    def _parallel_load(self, keys:list) -> dict:
+        """ Loads boxes concurrently; the resulting dictionary is
+        ordered as 'keys', regardless of which box finished first.
+        """
+        workers = self._opts["workers"]
+        kind = self._opts["pool"]
+        assert kind in ("thread", "process"), f"Invalid pool: {kind}"
+        res = {}
+        if kind == "thread":
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(self._load_box, key) for key in keys]
+                for key, fut in zip(keys, futures):
+                    res[key] = fut.result()
+            return res
+        boxes = [self._new_box(key) for key in keys]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(
+                    timed_read_box, self._paths[key], new.get_encoding(), self._opts["cache"],
+                )
+                for key, new in zip(keys, boxes)
+            ]
+            for key, new, fut in zip(keys, boxes, futures):
+                data, elapsed = fut.result()
+                start = time.perf_counter()
+                is_ok = new.adopt(data, self._paths[key])
+                if is_ok and self._opts["indexes"]:
+                    new.load_index()
+                self._timings[key] = elapsed + time.perf_counter() - start
+                res[key] = (new.dlist, new, int(is_ok))
+        return res
+
+    def _box_ids(self) -> dict:
+        return {box["Key"]: box["Id"] for box in self._schema.inlist}
+
     def _listed_dir(self, path:str) -> tuple:
         adir = os.path.dirname(os.path.realpath(path))
         return adir, os.listdir(adir)
 
+class LazyTables(dict):
+    """ Tables dictionary which loads each box on first access.
+    Keys are known upfront (from the schema), values are loaded on demand.
+    """
+    def __init__(self, box_loader):
+        super().__init__()
+        self._box_loader = box_loader
+
+    def declare(self, key:str):
+        super().__setitem__(key, None)
+
+    def resident(self) -> list:
+        """ Returns the (sorted) names of the loaded boxes. """
+        return sorted(key for key, tup in super().items() if tup is not None)
+
+    def __getitem__(self, key):
+        tup = super().__getitem__(key)
+        if tup is None:
+            tup = self._box_loader(key)
+            super().__setitem__(key, tup)
+        return tup
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        return self[key]
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
 def loader(adir, main_table=""):
     dbx = jdba.database.Database(adir)
     dbx.default_box = main_table
     return dbx
 
+def timed_read_box(path:str, encoding:str, use_cache=False) -> tuple:
+    """ Returns the decoded box and the elapsed time; used by process pools. """
+    start = time.perf_counter()
+    data = read_box(path, encoding, use_cache)
+    return data, time.perf_counter() - start
+
 def slim_list(alist):
     assert isinstance(alist, list)
     if not alist:
@@ -9,9 +9,21 @@ each 'case' designates one list of dictionaries.
 # pylint: disable=missing-function-docstring
 
 import os
+import gc
 import json
+import itertools
 from copy import deepcopy
 import jdba.jcommon as jcommon
+from jdba import jcodec
+from jdba import jstream
+from jdba import jcache
+from jdba import jrows
+from jdba import jixfile
+
+TMP_SUFFIX = ".tmp"
+LOG_SUFFIX = ".log"
+
+BOX_EPOCHS = itertools.count(1)	# distinct for each box (re)load, see case_version()
 
 BASIC_DICT_TAIL = {
     "Id": 0,
@@ -41,6 +53,16 @@ class IOJData(jcommon.GenericData):
 
     def _write_content(self, path:str, astr:str, debug=0) -> bool:
         """ Write content, Linux text (no CR-LF, but only LF)
+        The file is replaced atomically: a crash never leaves it truncated.
+        """
+        tmp = self._stage_content(path, astr, debug)
+        if tmp:
+            commit_staged(tmp, path)
+        return True
+
+    def _stage_content(self, path:str, astr:str, debug=0) -> str:
+        """ Writes content to a temporary file, next to 'path'.
+        Returns the temporary path, or an empty string if nothing to write.
         """
         assert debug >= 0, path
         self._did_write = False
@@ -52,15 +74,11 @@ class IOJData(jcommon.GenericData):
                     there = fdin.read()
                 alen = len(there)
                 if alen == len(astr) and there.decode(self._encoding) == astr:
-                    return True
-        if os.name == "nt":
-            with open(path, "wb") as fdout:
-                fdout.write(astr.encode(self._encoding))
-        else:
-            with open(path, "w", encoding=self._encoding) as fdout:
-                fdout.write(astr)
+                    return ""
+        tmp = path + TMP_SUFFIX
+        write_synced(tmp, astr.encode(self._encoding))
         self._did_write = True
-        return True
+        return tmp
 
     def _write_stream(self, fdout, astr:str) -> bool:
         fdout.write(astr)
@@ -69,6 +87,8 @@ class IOJData(jcommon.GenericData):
 class JBox(IOJData):
     """ Generic manipulation of data, to/ from JSON format.
     """
+    log_compact_at = 1000	# log lines before save() compacts the log
+
     def __init__(self, data=None, name="", encoding=None):
         super().__init__(name)
         self.set_encoding(encoding)
@@ -80,6 +100,71 @@ class JBox(IOJData):
         self._ensure_ascii = enc
         self.dlist = None
         self.new_idx = {}
+        self._origin = ""	# path last loaded from, or saved to
+        self._dirty = data is not None
+        self._full = self._dirty	# True: changes cannot be just logged
+        self._ops = []		# changes not yet saved
+        self._log_mode = False
+        self._log_lines = 0
+        self._log_base = ""	# content hash of the box file the log applies to
+        self._staged_base = ""
+        self._staged_log = ""
+        self._staged_full = False	# True: the whole box was staged, see commit()
+        self._keys = {}		# memoized content keys, see content_key()
+        self._partial = False
+        self._use_cache = False
+        self._packing = False
+        self._pool = None
+        self._ix_file = False	# True: persisted indexes match the box
+        self._epoch = next(BOX_EPOCHS)
+        self._versions = {}	# case key: number of changes
+
+    def set_packing(self, packing=True) -> bool:
+        """ When set, load() packs cases into compact rows, see pack_rows(). """
+        self._packing = bool(packing)
+        return self._packing
+
+    def pack_rows(self) -> list:
+        """ Stores records of (homogeneous) cases as compact rows.
+        Returns the list of packed cases.
+        """
+        res = []
+        for acase, data in self._data.items():
+            if not jrows.packable(data):
+                continue
+            self._data[acase] = jrows.CompactCase(data)
+            res.append(acase)
+        if res:
+            self._reindex()
+        return res
+
+    def unpack_rows(self) -> list:
+        """ Reverts pack_rows(); returns the list of unpacked cases. """
+        res = []
+        for acase, data in self._data.items():
+            if isinstance(data, jrows.CompactCase):
+                self._data[acase] = data.unpacked()
+                res.append(acase)
+        if res:
+            self._reindex()
+        return res
+
+    def set_pool(self, pool) -> bool:
+        """ When set (a jpool.ValuePool), load() interns keys and deduplicates values. """
+        self._pool = pool
+        return pool is not None
+
+    def set_cache(self, use_cache=True) -> bool:
+        """ When set, load() uses (and refreshes) a binary snapshot of the box. """
+        self._use_cache = bool(use_cache)
+        return self._use_cache
+
+    def set_log(self, log_mode=True) -> bool:
+        """ When set, saving changes done by add_to(), update_at() and remove_from()
+        appends them to a sidecar log ('path' + '.log'), instead of rewriting the box.
+        """
+        self._log_mode = bool(log_mode)
+        return self._log_mode
 
     def to_string(self) -> str:
         return self._dump_json_string()
@@ -87,14 +172,93 @@ class JBox(IOJData):
     def raw(self):
         return self._data
 
+    def is_dirty(self) -> bool:
+        """ Returns True if content changed since last load/ save. """
+        return self._dirty
+
+    def touch(self, acase:str="") -> bool:
+        """ Marks content as changed; call it after editing cases directly. """
+        assert isinstance(acase, str), self.name
+        self._dirty, self._full = True, True
+        if acase:
+            self._versions[acase] = self._versions.get(acase, 0) + 1
+        else:
+            self._epoch = next(BOX_EPOCHS)
+        self._reindex(acase)
+        return True
+
+    def case_version(self, acase:str) -> tuple:
+        """ Returns a token which changes whenever case 'acase' (its key) changes,
+        through this box; see touch() after direct edits.
+        """
+        return (self._epoch, self._versions.get(acase, 0))
+
+    def _reindex(self, acase:str=""):
+        """ Rebuilds indexes already built (keeping declared field indexes) """
+        if self.dlist is None or not self.dlist.index.initialized():
+            return
+        name = self.dlist.index.name_of(acase) if acase else ""
+        if not name:
+            self.dlist.do_index()
+        self.dlist.index.refresh(name)
+
+    def _indexing(self, event:str, acase:str, idx:int, *items) -> bool:
+        """ Keeps already built indexes up to date. """
+        if self.dlist is None or not self.dlist.index.initialized():
+            return False
+        ixr = self.dlist.index
+        name = ixr.name_of(acase)
+        if not name:
+            return False
+        if event == "add":
+            return ixr.on_insert(name, idx, *items)
+        if event == "upd":
+            return ixr.on_update(name, idx, *items)
+        return ixr.on_remove(name, idx, *items)
+
+    def _record(self, op:dict) -> bool:
+        self._dirty = True
+        self._ops.append(op)
+        acase = op["case"]
+        self._versions[acase] = self._versions.get(acase, 0) + 1
+        return True
+
     def add_to(self, acase:str, new:dict) -> bool:
         data = self._data.get(acase)
         if data is None:
             return False
-        is_ok, _, new_idx = self._inject_new(acase, data, new, "APP")
+        is_ok, mine, new_idx = self._inject_new(acase, data, new, "APP")
         self.new_idx[acase] = new_idx
+        if is_ok:
+            self._record({"op": "add", "case": acase, "rec": mine})
+            self._indexing("add", acase, new_idx, data[new_idx])
         return is_ok
 
+    def update_at(self, acase:str, an_id:int, new:dict) -> bool:
+        """ Updates fields of the record with Id 'an_id'. """
+        data = self._data.get(acase)
+        idx = find_id(data, an_id)
+        if idx < 0:
+            return False
+        assert "Id" not in new or new["Id"] == an_id, f"{acase}: cannot change Id={an_id}"
+        old = dict(data[idx])
+        if isinstance(data[idx], jrows.Row):
+            data[idx] = dict(data[idx], **new)
+        else:
+            data[idx].update(new)
+        self._indexing("upd", acase, idx, old, data[idx])
+        return self._record({"op": "upd", "case": acase, "id": an_id, "rec": dict(new)})
+
+    def remove_from(self, acase:str, an_id:int) -> bool:
+        """ Removes the record with Id 'an_id'. """
+        data = self._data.get(acase)
+        idx = find_id(data, an_id)
+        if idx < 0:
+            return False
+        old = data.pop(idx)
+        self._indexing("del", acase, idx, old)
+        return self._record({"op": "del", "case": acase, "id": an_id})
+
     def _inject_new(self, acase, data, new, s_append) -> tuple:
         assert acase, self.name
         assert s_append and isinstance(s_append, str), acase
@@ -121,33 +285,218 @@ class JBox(IOJData):
             return False, None, -1
         return True, mine, new_idx
 
-    def load(self, path:str) -> bool:
+    def load(self, path:str, cases=None) -> bool:
+        """ Loads the box at 'path'.
+        :param cases: if given, only these cases are loaded (streaming);
+            such a partial box cannot be saved.
+        """
         self._data = {}
+        self._partial = cases is not None
+        if not self._partial:
+            data = read_box(path, self._encoding, self._use_cache)
+            return self.adopt(data, path)
         try:
-            with open(path, "r", encoding=self._encoding) as fdin:
-                astr = fdin.read()
+            data = jstream.load_cases(path, cases, self._encoding)
         except FileNotFoundError:
             return False
-        data = json.loads(astr)
+        return self.adopt(data, path)
+
+    def is_partial(self) -> bool:
+        """ Returns True if only some cases were loaded. """
+        return self._partial
+
+    def adopt(self, data, path:str) -> bool:
+        """ Uses already decoded data, as if it was loaded from 'path'.
+        Changes logged next to 'path' are applied.
+        """
+        if data is None:
+            self._data = {}
+            return False
+        self._log_lines, self._log_base = 0, ""
+        self._keys = {}
+        if os.path.isfile(path + LOG_SUFFIX):
+            self._log_base = file_gen(path)
+            # A stale log (of an older box file) counts as no log at all
+            self._log_lines = max(
+                0, replay_log(data, path + LOG_SUFFIX, self._encoding, self._log_base),
+            )
+        if self._pool is not None:
+            data = self._pool.intern_data(data)
         self.dlist = jcommon.DData(data, path)
         self._data = data
+        self._epoch, self._versions = next(BOX_EPOCHS), {}
+        self._origin = path
+        self._clean()
+        if self._packing:
+            self.pack_rows()
         return True
 
+    def save_index(self, path:str="") -> bool:
+        """ Persists computed indexes next to the box (see jixfile);
+        only an unchanged, fully loaded box can have its indexes persisted.
+        """
+        where = path if path else self._origin
+        if not where or where != self._origin or self._dirty or self._partial:
+            return False
+        if self.dlist is None or not self.dlist.index.initialized():
+            return False
+        self._ix_file = jixfile.store(where, self.dlist.index.snapshot(), self.content_key())
+        return self._ix_file
+
+    def load_index(self, path:str="") -> bool:
+        """ Restores indexes persisted by save_index(), if still valid. """
+        where = path if path else self._origin
+        if not where or where != self._origin or self._dirty or self._partial:
+            return False
+        if self.dlist is None:
+            return False
+        snap = jixfile.fetch(where, self.content_key())
+        if snap is None:
+            return False
+        self._ix_file = self.dlist.index.restore(snap, self._data)
+        return self._ix_file
+
+    def index_persisted(self) -> bool:
+        """ Returns True if indexes were restored from, or saved to, the box sidecar. """
+        return self._ix_file
+
+    def content_key(self):
+        """ Returns the key of the box file content (and of its log) last loaded or saved,
+        see jixfile.box_key(); None if there is no such file.
+        The key is hashed at most once per load or save, or when files change on disk.
+        """
+        if not self._origin:
+            return None
+        return jixfile.memo_key(self._origin, self._keys)
+
+    def _clean(self):
+        self._ix_file = False
+        self._dirty, self._full = False, False
+        self._ops = []
+
     def flush(self) -> bool:
         self.new_idx = {}
         return True
 
     def save(self, path:str) -> bool:
-        """ Save content to a file, at 'path'. """
+        """ Save content to a file, at 'path'.
+        Unless saving always, an unchanged box is not even serialized.
+        """
+        if self._partial:
+            return False
+        try:
+            if self._can_log(path):
+                return self._append_log(path)
+            tmp = self.stage(path)
+        except FileNotFoundError:
+            return False
+        return self.commit(tmp, path)
+
+    def compact(self, path:str="") -> bool:
+        """ Folds the sidecar log into the (canonical) box file. """
+        where = path if path else self._origin
+        assert where, self.name
+        if self._partial:
+            return False
+        try:
+            tmp = self._stage_full(where)
+        except FileNotFoundError:
+            return False
+        return self.commit(tmp, where)
+
+    def stage(self, path:str) -> str:
+        """ Writes the content to be saved at 'path' into a temporary file.
+        Returns the temporary path, or an empty string if nothing to write.
+        The staged file replaces either 'path' or its log, see commit().
+        """
+        assert not self._partial, f"Cannot save partial box: {self.name}"
+        self.flush()
+        self._staged_full = False
+        if not self._dirty and path == self._origin and not IOJData.save_always():
+            self._did_write = False
+            return ""
+        if self._can_log(path):
+            lpath = path + LOG_SUFFIX
+            there = self._log_header(path).encode(self._encoding)
+            if self._log_lines > 0 and os.path.isfile(lpath):
+                with open(lpath, "rb") as fdin:
+                    there = fdin.read()
+            tmp = lpath + TMP_SUFFIX
+            content = there + self._log_string().encode(self._encoding)
+            write_synced(tmp, content)
+            self._staged_log = jcache.digest(content)
+            self._did_write = True
+            return tmp
+        return self._stage_full(path)
+
+    def _stage_full(self, path:str) -> str:
         self.flush()
         astr = self._dump_json_string(self._ensure_ascii)
         astr += "\n"
-        try:
-            self._write_content(path, astr)
-        except FileNotFoundError:
+        self._staged_base = jcache.digest(astr.encode(self._encoding))
+        self._staged_full = True
+        return self._stage_content(path, astr)
+
+    def commit(self, tmp:str, path:str) -> bool:
+        """ Renames the staged file (if any) to where it belongs. """
+        if tmp:
+            target = tmp[:-len(TMP_SUFFIX)]
+            commit_staged(tmp, target)
+            if target == path + LOG_SUFFIX:
+                self._log_lines += len(self._ops)
+                key = jixfile.key_of(self._log_base, self._staged_log)
+            else:
+                # A log left by a crash, right here, no longer matches the box: see replay_log()
+                self._drop_log(path)
+                self._log_base = self._staged_base
+                key = jixfile.key_of(self._staged_base, "")
+            # Content just written: no need to read it back for hashing
+            self._keys = {path: (jixfile.box_sig(path), key)}
+        elif self._staged_full and os.path.isfile(path + LOG_SUFFIX):
+            # The box file already matched the content (see _stage_content()): the log is obsolete
+            self._drop_log(path)
+            self._log_base = self._staged_base
+            self._keys = {}
+        self._staged_full = False
+        self._origin = path
+        self._clean()
+        return True
+
+    def _can_log(self, path:str) -> bool:
+        if not self._log_mode or self._full or not self._ops:
+            return False
+        if path != self._origin:
             return False
+        return self._log_lines + len(self._ops) < JBox.log_compact_at
+
+    def _log_string(self) -> str:
+        lines = [json.dumps(op, sort_keys=True, ensure_ascii=True) + "\n" for op in self._ops]
+        return "".join(lines)
+
+    def _append_log(self, path:str) -> bool:
+        """ Appends pending changes to the log of 'path'. """
+        self.flush()
+        is_new = self._log_lines <= 0
+        with open(path + LOG_SUFFIX, "w" if is_new else "a", encoding=self._encoding) as fdout:
+            fdout.write((self._log_header(path) if is_new else "") + self._log_string())
+            fdout.flush()
+            os.fsync(fdout.fileno())
+        self._did_write = True
+        self._log_lines += len(self._ops)
+        self._clean()
         return True
 
+    def _log_header(self, path:str) -> str:
+        """ Returns the first line of a new log: the hash of the box file it applies to. """
+        if not self._log_base:
+            self._log_base = file_gen(path)
+        return json.dumps({"base": self._log_base, "op": "base"}, sort_keys=True) + "\n"
+
+    def _drop_log(self, path:str):
+        self._log_lines = 0
+        if os.path.isfile(path + LOG_SUFFIX):
+            os.remove(path + LOG_SUFFIX)
+
     def save_stream(self, fdout) -> bool:
         astr = self._dump_json_string(self._ensure_ascii)
         astr += "\n"
@@ -170,12 +519,120 @@ class JBox(IOJData):
         """
         cont = self._data	# Content!
         ind, asort, ensure = 2, True, ensure_ascii
-        astr = json.dumps(cont, indent=ind, sort_keys=asort, ensure_ascii=ensure)
+        astr = jcodec.dumps(cont, indent=ind, sort_keys=asort, ensure_ascii=ensure)
         return astr
 
     def __str__(self) -> str:
         return self.to_string()
 
+def write_synced(path:str, content:bytes):
+    """ Writes (binary) content and flushes it to disk. """
+    with open(path, "wb") as fdout:
+        fdout.write(content)
+        fdout.flush()
+        os.fsync(fdout.fileno())
+
+def commit_staged(tmp:str, path:str):
+    """ Atomically replaces 'path' by 'tmp'. """
+    os.replace(tmp, path)
+    sync_dir(os.path.dirname(path))
+
+def sync_dir(adir:str):
+    """ Flushes directory entries (renames) to disk, where supported. """
+    if os.name == "nt":
+        return
+    fd_dir = os.open(adir if adir else ".", os.O_RDONLY)
+    try:
+        os.fsync(fd_dir)
+    finally:
+        os.close(fd_dir)
+
+def find_id(data, an_id:int) -> int:
+    """ Returns the list index of the record with Id 'an_id', or -1. """
+    if not isinstance(data, list) or an_id <= 0:
+        return -1
+    for idx, item in enumerate(data):
+        if item.get("Id") == an_id:
+            return idx
+    return -1
+
+def file_gen(path:str) -> str:
+    """ Returns the content hash of a box file, or an empty string. """
+    try:
+        with open(path, "rb") as fdin:
+            return jcache.digest(fdin.read())
+    except FileNotFoundError:
+        return ""
+
+def replay_log(data:dict, lpath:str, encoding:str, base:str="") -> int:
+    """ Applies the changes logged at 'lpath' to the box data.
+    Replaying is idempotent: records already there are not added twice.
+    :param base: content hash of the box file; a log whose header names
+        another hash was left behind by a compaction, and is not applied.
+    Returns the number of logged changes, or -1 if the log is stale.
+    """
+    try:
+        with open(lpath, "r", encoding=encoding) as fdin:
+            lines = fdin.read().splitlines()
+    except FileNotFoundError:
+        return 0
+    res = len(lines)
+    for num, line in enumerate(lines, 1):
+        try:
+            op = jcodec.loads(line)
+        except json.decoder.JSONDecodeError:
+            # Only the last line can be truncated, by an interrupted append
+            assert num == len(lines), f"Bad log line {num}: {lpath}"
+            break
+        if op["op"] == "base":
+            if base and op["base"] != base:
+                return -1
+            res -= 1
+            continue
+        cases = data.get(op["case"])
+        if cases is None:
+            continue
+        if op["op"] == "add":
+            if find_id(cases, op["rec"]["Id"]) < 0:
+                cases.insert(len(cases) - 1, op["rec"])
+            continue
+        idx = find_id(cases, op["id"])
+        if idx < 0:
+            continue
+        if op["op"] == "upd":
+            cases[idx].update(op["rec"])
+        else:
+            del cases[idx]
+    return res
+
+def read_box(path:str, encoding:str, use_cache=False):
+    """ Reads and decodes a box file; returns None if the file does not exist.
+    Module-level, so that it can be used by process pools.
+    """
+    try:
+        with open(path, "rb") as fdin:
+            content = fdin.read()
+    except FileNotFoundError:
+        return None
+    # Decoded boxes have no reference cycles: no need for collecting while building
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return decode_box(path, content, encoding, use_cache)
+    finally:
+        if was_enabled:
+            gc.enable()
+
+def decode_box(path:str, content:bytes, encoding:str, use_cache=False):
+    if use_cache:
+        data = jcache.fetch(path, content)
+        if data is not None:
+            return data
+    data = jcodec.loads(content.decode(encoding))
+    if use_cache:
+        jcache.store(path, content, data)
+    return data
+
 # Main script
 if __name__ == "__main__":
     print("Please import me!")
@@ -0,0 +1,73 @@
+# jcache.py  (c)2026  Henrique Moreira
+
+""" Binary snapshot cache of boxes
+
+Each box may have a sidecar ('box.json' + '.jcache') with its decoded content,
+keyed by the box file size, modification time and content hash.
+Any mismatch makes the cache invalid, and the box is parsed as usual.
+"""
+
+# pylint: disable=missing-function-docstring
+
+import os
+import sys
+import marshal
+import hashlib
+
+CACHE_SUFFIX = ".jcache"
+CACHE_MAGIC = "jdb-cache-1"
+
+
+def digest(content:bytes) -> str:
+    """ Returns the content hash (hex string). """
+    return hashlib.sha1(content).hexdigest()
+
+def file_key(path:str, content:bytes) -> tuple:
+    """ Returns the key identifying the (current) file content. """
+    stt = os.stat(path)
+    return (
+        CACHE_MAGIC, tuple(sys.version_info[:2]),
+        stt.st_size, stt.st_mtime_ns, digest(content),
+    )
+
+def fetch(path:str, content:bytes):
+    """ Returns the cached data for 'path', or None if there is no valid cache.
+    :param content: the current (raw) content of 'path'
+    """
+    try:
+        with open(path + CACHE_SUFFIX, "rb") as fdin:
+            alen = int.from_bytes(fdin.read(4), "little")
+            key = marshal.loads(fdin.read(alen))
+            if key != file_key(path, content):
+                return None
+            data = marshal.loads(fdin.read())
+    except (FileNotFoundError, EOFError, ValueError, TypeError):
+        return None
+    return data
+
+def store(path:str, content:bytes, data) -> bool:
+    """ Stores the decoded 'data' of 'path'; returns False if not possible. """
+    head = marshal.dumps(file_key(path, content))
+    try:
+        astr = len(head).to_bytes(4, "little") + head + marshal.dumps(data)
+    except ValueError:
+        return False
+    tmp = path + CACHE_SUFFIX + ".tmp"
+    try:
+        with open(tmp, "wb") as fdout:
+            fdout.write(astr)
+        os.replace(tmp, path + CACHE_SUFFIX)
+    except OSError:
+        return False
+    return True
+
+def drop(path:str) -> bool:
+    """ Removes the cache of 'path', if any. """
+    if not os.path.isfile(path + CACHE_SUFFIX):
+        return False
+    os.remove(path + CACHE_SUFFIX)
+    return True
+
+# Main script
+if __name__ == "__main__":
+    print("Please import me!")
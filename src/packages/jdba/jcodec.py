@@ -0,0 +1,184 @@
+# jcodec.py  (c)2026  Henrique Moreira
+
+""" JSON codecs
+
+The standard library 'json' is the reference codec;
+'orjson' is used instead, when available, as long as the output
+is byte-identical to the reference (indent=2, sort_keys, ensure_ascii).
+"""
+
+# pylint: disable=missing-function-docstring
+
+import re
+import json
+from json.encoder import encode_basestring_ascii
+from collections.abc import Mapping
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+NON_ASCII = re.compile("[\x7f-\U0010ffff]+")
+ASTRAL = re.compile(rb"\\U([0-9a-f]{8})")
+# Digits as 'd', minus as is, anything else as blank: see wide_ints()
+DIGIT_RUNS = bytes(
+    ord("d") if chr(code) in "0123456789" else code if code == ord("-") else ord(" ")
+    for code in range(256)
+)
+CONTAINERS = (dict, list, tuple)
+
+
+class StdCodec():
+    """ Reference codec, standard library 'json'.
+    """
+    name = "json"
+
+    def dumps(self, data, ensure_ascii=True) -> str:
+        """ Returns the (indented, sorted) JSON string. """
+        return json.dumps(
+            data, indent=2, sort_keys=True, ensure_ascii=ensure_ascii, default=plain_default,
+        )
+
+    def loads(self, astr):
+        return json.loads(astr)
+
+    def load(self, fdin):
+        return self.loads(fdin.read())
+
+class FastCodec(StdCodec):
+    """ Accelerated codec, relying on 'orjson'.
+    Falls back to the reference codec whenever orjson would differ:
+    floats shown with exponents, NaN, huge integers or non-string keys;
+    when decoding: NaN, or (possibly) huge integers, see wide_ints().
+    """
+    name = "orjson"
+
+    def dumps(self, data, ensure_ascii=True) -> str:
+        if not plain_floats(data):
+            return super().dumps(data, ensure_ascii)
+        opts = orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
+        try:
+            bstr = orjson.dumps(data, option=opts, default=plain_default)
+        except TypeError:
+            return super().dumps(data, ensure_ascii)
+        astr = bstr.decode("utf-8")
+        if ensure_ascii and not (bstr.isascii() and "\x7f" not in astr):
+            astr = escape_non_ascii(astr)
+        return astr
+
+    def loads(self, astr):
+        if wide_ints(astr):
+            # orjson would silently decode such integers as floats
+            return super().loads(astr)
+        try:
+            return orjson.loads(astr)
+        except orjson.JSONDecodeError:
+            # e.g. NaN; also gets the usual exceptions
+            return super().loads(astr)
+
+CODECS = {
+    "json": StdCodec,
+    "orjson": FastCodec,
+}
+
+class SingletonCodec():
+    """ Holds the codec in use. """
+    codec = FastCodec() if orjson is not None else StdCodec()
+
+def get_codec():
+    return SingletonCodec.codec
+
+def set_codec(name:str="") -> str:
+    """ Sets the codec by name; empty means the best available.
+    Returns the name of the codec in use.
+    """
+    if not name:
+        name = "json" if orjson is None else "orjson"
+    assert name in CODECS, f"Invalid codec: {name}"
+    assert name == "json" or orjson is not None, f"Codec not available: {name}"
+    SingletonCodec.codec = CODECS[name]()
+    return name
+
+def dumps(data, indent=2, sort_keys=True, ensure_ascii=True) -> str:
+    """ Dump JSON; only the default format (indent=2, sorted) is accelerated. """
+    if indent != 2 or not sort_keys:
+        return json.dumps(
+            data, indent=indent, sort_keys=sort_keys, ensure_ascii=ensure_ascii,
+            default=plain_default,
+        )
+    return SingletonCodec.codec.dumps(data, ensure_ascii)
+
+def loads(astr):
+    return SingletonCodec.codec.loads(astr)
+
+def load(fdin):
+    return SingletonCodec.codec.load(fdin)
+
+def wide_ints(astr) -> bool:
+    """ Returns True if the JSON text (str or bytes) may hold integers that orjson
+    would silently decode as floats: beyond 64bit (unsigned), or below -2**63.
+    A run of 20 digits (or of 19, after a minus) is enough to tell;
+    a bytes.translate() and two substring searches are much faster than a regex.
+    """
+    if isinstance(astr, str):
+        astr = astr.encode("utf-8", "surrogatepass")
+    runs = astr.translate(DIGIT_RUNS)
+    return b"d" * 20 in runs or b"-" + b"d" * 19 in runs
+
+def plain_floats(data) -> bool:
+    """ Returns True if all floats within data are shown without exponent
+    by repr(), and are neither NaN nor infinite.
+    """
+    stack = [[data]]
+    while stack:
+        item = stack.pop()
+        for aval in (item if isinstance(item, (list, tuple)) else item.values()):
+            if isinstance(aval, float):
+                if not (1e-4 <= abs(aval) < 1e16 or aval == 0.0):
+                    return False
+            elif isinstance(aval, CONTAINERS):
+                stack.append(aval)
+            elif aval is not None and not isinstance(aval, (str, int)) and isinstance(aval, Mapping):
+                stack.append(aval)
+    return True
+
+def plain_default(obj):
+    """ JSON 'default' hook: other mappings (e.g. compact rows) are dumped as dictionaries. """
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def escape_non_ascii(astr:str) -> str:
+    """ Same escaping as json.dumps(..., ensure_ascii=True),
+    for non-ASCII characters (and DEL) within an already dumped string.
+    """
+    if "\\\\" not in astr:
+        # No escaped backslashes: any '\x' or '\U' comes from backslashreplace
+        bstr = astr.encode("ascii", "backslashreplace")
+        bstr = bstr.replace(b"\\x", b"\\u00").replace(b"\x7f", b"\\u007f")
+        if b"\\U" in bstr:
+            bstr = ASTRAL.sub(escape_astral, bstr)
+        return bstr.decode("ascii")
+    done = {}
+
+    def escape_run(match) -> str:
+        run = match.group()
+        res = done.get(run)
+        if res is None:
+            res = encode_basestring_ascii(run)[1:-1]
+            done[run] = res
+        return res
+
+    return NON_ASCII.sub(escape_run, astr)
+
+def escape_astral(match) -> bytes:
+    """ Surrogate pair for a '\\UXXXXXXXX' escape """
+    num = int(match.group(1), 16) - 0x10000
+    high = 0xd800 | ((num >> 10) & 0x3ff)
+    low = 0xdc00 | (num & 0x3ff)
+    return b"\\u%04x\\u%04x" % (high, low)
+
+# Main script
+if __name__ == "__main__":
+    print("Please import me!")
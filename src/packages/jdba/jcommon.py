@@ -5,9 +5,11 @@
 
 # pylint: disable=missing-function-docstring
 
-import json
 import unidecode
 from jdba.jindex import JIndex
+from jdba.jquery import Query
+from jdba.jgroup import group_by
+from jdba import jcodec
 
 J_ENSURE_ASCII = True
 
@@ -150,7 +152,7 @@ class DataSchema(GenericData):
 
     def _json_dump(self):
         ind, asort, ensure = 2, True, True
-        astr = json.dumps(self._ptr, indent=ind, sort_keys=asort, ensure_ascii=ensure)
+        astr = jcodec.dumps(self._ptr, indent=ind, sort_keys=asort, ensure_ascii=ensure)
         return astr
 
 class AData(GenericData):
@@ -163,6 +165,12 @@ class AData(GenericData):
         self._strict = False
         self._do_sort = True
         self.index = JIndex()
+        self.pool = None	# see jpool.ValuePool
+
+    def set_pool(self, pool) -> bool:
+        """ When set, load() interns keys and deduplicates repeated values. """
+        self.pool = pool
+        return pool is not None
 
     def raw(self):
         return self._data
@@ -200,6 +208,42 @@ class AData(GenericData):
             return key, [], None
         return key, self._data, res
 
+    def find(self, name:str, **values) -> list:
+        """ Returns the records of case 'name' with the given field values,
+        e.g. find("sample", Mark="2022-06-04")
+        """
+        self.get_case_root(name)
+        return self.index.find(name, **values)
+
+    def find_range(self, name:str, field, low=None, high=None) -> list:
+        """ Returns the records of case 'name' with 'field' between low and high,
+        e.g. find_range("sample", "Mark", "2022-06-01", "2022-06-30")
+        """
+        self.get_case_root(name)
+        return self.index.find_range(name, field, low, high)
+
+    def query(self, name:str):
+        """ Returns a query on case 'name', e.g.
+		query("sample").where(Key="url").order_by("-Mark").limit(10).run()
+        """
+        self.get_case_root(name)
+        return Query(self, name)
+
+    def search(self, name:str, text:str, mode:str="and", fields=None) -> list:
+        """ Returns (record, score) pairs of case 'name' matching words of 'text',
+        best first; the case needs a 'text' index, e.g.
+		index.text_index("sample", ["Title"])
+        """
+        self.get_case_root(name)
+        return self.index.search(name, text, mode, fields)
+
+    def aggregate(self, name:str, by=(), **aggs) -> list:
+        """ Returns aggregations per group of case 'name', e.g.
+		aggregate("sample", "Key", n=("count", None), last=("max", "Mark"))
+        See jgroup.group_by().
+        """
+        return group_by(self, name, by, **aggs)
+
     def do_index(self) -> bool:
         """ Generates 'byname' indexes.
         """
@@ -212,14 +256,15 @@ class AData(GenericData):
         }
         for idx, key in enumerate(data):
             if key == "~":
+                self.index.build_pending()
                 return True
             byidx[idx] = key
             assert (idx == 0 and key.startswith("!")) or idx, key
             prefix = key.split("=", maxsplit=1)[0]
             name = prefix if idx > 0 else "!"
             byname[name] = key
-            if name in data:
-                ptrs[name] = data[name]
+            ptrs[name] = data[key]
+        self.index.build_pending()
         return not self._strict
 
     def __str__(self) -> str:
@@ -231,6 +276,8 @@ class AData(GenericData):
     def load(self, path:str) -> bool:
         with open(path, "r", encoding=self._encoding) as fdin:
             data = read_json(fdin)
+        if self.pool is not None:
+            data = self.pool.intern_data(data)
         self._data = data
         self.index = JIndex()
         return True
@@ -246,11 +293,11 @@ class AData(GenericData):
             cont = GenericData.default_dlist()
         else:
             cont = data
-        astr = json.dumps(cont, indent=ind, sort_keys=asort, ensure_ascii=ensure)
+        astr = jcodec.dumps(cont, indent=ind, sort_keys=asort, ensure_ascii=ensure)
         return astr + "\n"
 
     def from_json(self, astring:str) -> bool:
-        data = json.loads(astring)
+        data = jcodec.loads(astring)
         self._data = data
         return True
 
@@ -272,7 +319,7 @@ class DData(AData):
 
 def read_json(fdin):
     """ Read JSON from stream """
-    data = json.load(fdin)
+    data = jcodec.load(fdin)
     return data
 
 def overview(data, depth=0):
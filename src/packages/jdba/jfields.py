@@ -0,0 +1,306 @@
+# jfields.py  (c)2026  Henrique Moreira
+
+""" Secondary (field) indexes of a case
+
+A field index maps the values of one or more fields to record Ids:
+'hash' indexes serve equality lookups, 'sorted' indexes keep values in order.
+Records with Id <= 0 (e.g. the closing 'Id: 0' record) are not indexed.
+"""
+
+# pylint: disable=missing-function-docstring
+
+from bisect import bisect_left, bisect_right, insort
+
+INDEX_KINDS = ("hash", "sorted", "values", "text")
+EQUALITY_KINDS = ("hash", "sorted")	# kinds serving field equalities
+
+MAX_CHAR = chr(0x10ffff)
+INFINITE = float("inf")
+
+
+class FieldIndex():
+    """ Abstract field index
+    """
+    kind = ""
+
+    def __init__(self, fields):
+        if isinstance(fields, str):
+            fields = (fields,)
+        assert fields, "No fields"
+        self.fields = tuple(fields)
+
+    def spec(self) -> str:
+        return "+".join(self.fields)
+
+    def key_of(self, item):
+        """ Returns the (hashable) index key of a record. """
+        if len(self.fields) == 1:
+            return freeze(item.get(self.fields[0]))
+        return tuple(freeze(item.get(field)) for field in self.fields)
+
+    def key_from(self, values:dict):
+        """ Returns the index key, given field values. """
+        if len(self.fields) == 1:
+            return freeze(values[self.fields[0]])
+        return tuple(freeze(values[field]) for field in self.fields)
+
+    def build(self, data) -> int:
+        """ (Re)builds the index from a case; returns the number of indexed records. """
+        self.clear()
+        num = 0
+        for item in data:
+            if self.add(item):
+                num += 1
+        return num
+
+    def clear(self):
+        raise NotImplementedError
+
+    def add(self, item) -> bool:
+        raise NotImplementedError
+
+    def remove(self, item) -> bool:
+        raise NotImplementedError
+
+    def lookup(self, key) -> list:
+        """ Returns the Ids of records with this index key. """
+        raise NotImplementedError
+
+    def snapshot(self):
+        """ Returns the index content, as plain (marshal-able) data. """
+        raise NotImplementedError
+
+    def restore(self, state) -> bool:
+        """ Sets the index content from snapshot() data. """
+        raise NotImplementedError
+
+class HashIndex(FieldIndex):
+    """ Equality index: key -> list of Ids
+    """
+    kind = "hash"
+
+    def __init__(self, fields):
+        super().__init__(fields)
+        self._keys = {}
+
+    def clear(self):
+        self._keys = {}
+
+    def add(self, item) -> bool:
+        an_id = item["Id"]
+        if an_id <= 0:
+            return False
+        self._keys.setdefault(self.key_of(item), []).append(an_id)
+        return True
+
+    def remove(self, item) -> bool:
+        an_id = item["Id"]
+        if an_id <= 0:
+            return False
+        key = self.key_of(item)
+        ids = self._keys.get(key)
+        if not ids or an_id not in ids:
+            return False
+        ids.remove(an_id)
+        if not ids:
+            del self._keys[key]
+        return True
+
+    def lookup(self, key) -> list:
+        return list(self._keys.get(key, ()))
+
+    def snapshot(self):
+        return self._keys
+
+    def restore(self, state) -> bool:
+        assert isinstance(state, dict), self.spec()
+        self._keys = state
+        return True
+
+class SortedIndex(FieldIndex):
+    """ Ordered index: sorted list of (key, Id) pairs.
+    Keys of different types are ordered by type first, see order_key().
+    """
+    kind = "sorted"
+
+    def __init__(self, fields):
+        super().__init__(fields)
+        self._pairs = []
+
+    def clear(self):
+        self._pairs = []
+
+    def build(self, data) -> int:
+        """ Bulk build: sorts once, instead of inserting record by record. """
+        pairs = [
+            (order_key(self.key_of(item)), item["Id"]) for item in data if item["Id"] > 0
+        ]
+        pairs.sort()
+        self._pairs = pairs
+        return len(pairs)
+
+    def add(self, item) -> bool:
+        an_id = item["Id"]
+        if an_id <= 0:
+            return False
+        insort(self._pairs, (order_key(self.key_of(item)), an_id))
+        return True
+
+    def remove(self, item) -> bool:
+        an_id = item["Id"]
+        if an_id <= 0:
+            return False
+        pair = (order_key(self.key_of(item)), an_id)
+        idx = bisect_left(self._pairs, pair)
+        if idx >= len(self._pairs) or self._pairs[idx] != pair:
+            return False
+        del self._pairs[idx]
+        return True
+
+    def lookup(self, key) -> list:
+        return list(self.irange(key, key))
+
+    def __len__(self) -> int:
+        return len(self._pairs)
+
+    def snapshot(self):
+        return self._pairs
+
+    def restore(self, state) -> bool:
+        assert isinstance(state, list), self.spec()
+        self._pairs = state
+        return True
+
+    def irange(self, low=None, high=None, inclusive=(True, True)):
+        """ Iterates over Ids with keys between low and high (None: unbounded),
+        in key order.
+        """
+        start, end = self._bounds(low, high, inclusive)
+        for idx in range(start, end):
+            yield self._pairs[idx][1]
+
+    def iprefix(self, astr:str):
+        """ Iterates over Ids with (string) keys starting by 'astr',
+        e.g. iprefix("2022-06") for ISO dates in June 2022.
+        """
+        assert isinstance(astr, str), self.spec()
+        return self.irange(astr, astr + MAX_CHAR)
+
+    def count_range(self, low=None, high=None, inclusive=(True, True)) -> int:
+        """ Returns the number of records with keys between low and high. """
+        start, end = self._bounds(low, high, inclusive)
+        return max(0, end - start)
+
+    def min_key(self):
+        """ Returns the smallest key, or None if empty. """
+        if not self._pairs:
+            return None
+        return plain_key(self._pairs[0][0])
+
+    def max_key(self):
+        """ Returns the largest key, or None if empty. """
+        if not self._pairs:
+            return None
+        return plain_key(self._pairs[-1][0])
+
+    def _bounds(self, low, high, inclusive) -> tuple:
+        low_incl, high_incl = inclusive
+        pairs = self._pairs
+        if low is None:
+            start = 0
+        elif low_incl:
+            start = bisect_left(pairs, (order_key(freeze(low)),))
+        else:
+            start = bisect_right(pairs, (order_key(freeze(low)), INFINITE))
+        if high is None:
+            end = len(pairs)
+        elif high_incl:
+            end = bisect_right(pairs, (order_key(freeze(high)), INFINITE))
+        else:
+            end = bisect_left(pairs, (order_key(freeze(high)),))
+        return start, max(start, end)
+
+class ValuesIndex(HashIndex):
+    """ Index of all string values of the records, whatever the field:
+    string -> list of Ids (each Id once per string).
+    Its only field is '*'.
+    """
+    kind = "values"
+
+    def __init__(self, fields=("*",)):
+        super().__init__(fields)
+        assert self.fields == ("*",), self.spec()
+
+    def strings_of(self, item) -> set:
+        return {aval for key, aval in item.items() if key != "Id" and isinstance(aval, str)}
+
+    def add(self, item) -> bool:
+        an_id = item["Id"]
+        if an_id <= 0:
+            return False
+        for aval in self.strings_of(item):
+            self._keys.setdefault(aval, []).append(an_id)
+        return True
+
+    def remove(self, item) -> bool:
+        an_id = item["Id"]
+        if an_id <= 0:
+            return False
+        is_ok = True
+        for aval in self.strings_of(item):
+            ids = self._keys.get(aval)
+            if not ids or an_id not in ids:
+                is_ok = False
+                continue
+            ids.remove(an_id)
+            if not ids:
+                del self._keys[aval]
+        return is_ok
+
+def new_index(fields, kind:str="hash"):
+    """ Returns a new field index of the given kind. """
+    assert kind in INDEX_KINDS, f"Invalid index kind: {kind}"
+    if kind == "sorted":
+        return SortedIndex(fields)
+    if kind == "values":
+        return ValuesIndex(fields)
+    if kind == "text":
+        # jtext relies on jcommon, which imports this module
+        from jdba.jtext import TextIndex	# pylint: disable=import-outside-toplevel
+        return TextIndex(fields)
+    return HashIndex(fields)
+
+def freeze(aval):
+    """ Returns a hashable equivalent of a (JSON) value. """
+    if isinstance(aval, list):
+        return tuple(freeze(elem) for elem in aval)
+    if isinstance(aval, dict):
+        return tuple((key, freeze(aval[key])) for key in sorted(aval))
+    return aval
+
+def order_key(aval) -> tuple:
+    """ Key for sorting values of mixed types:
+    null first, then numbers, strings, and anything else.
+    """
+    if aval is None:
+        return (0, 0)
+    if isinstance(aval, (int, float)):
+        return (1, aval)
+    if isinstance(aval, str):
+        return (2, aval)
+    if isinstance(aval, tuple):
+        return (3, tuple(order_key(elem) for elem in aval))
+    return (4, repr(aval))
+
+def plain_key(okey):
+    """ Reverts order_key() """
+    rank, aval = okey
+    if rank == 0:
+        return None
+    if rank == 3:
+        return tuple(plain_key(elem) for elem in aval)
+    return aval
+
+# Main script
+if __name__ == "__main__":
+    print("Please import me!")
@@ -0,0 +1,157 @@
+# jgroup.py  (c)2026  Henrique Moreira
+
+""" Group-by and aggregations over a case
+
+Records (Id > 0) are converted once to columns: fields holding only numbers
+become arrays ('q' for integers, 'd' for floats), other fields are lists.
+Columns are cached by the case index (JIndex.column_cache()), until the case changes.
+Aggregations run over whole columns: with 'numpy', when available,
+otherwise with the built-ins (sum, min, max) over each group positions.
+"""
+
+# pylint: disable=missing-function-docstring
+
+from array import array
+from jdba.jfields import order_key, freeze
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+AGGREGATES = ("count", "sum", "min", "max", "distinct")
+
+
+def to_column(rows:list, field:str):
+    """ Returns the values of 'field', as an array if all are numbers. """
+    vals = [item.get(field) for item in rows]
+    kinds = {type(aval) for aval in vals}
+    if kinds and kinds <= {int}:
+        try:
+            return array("q", vals)
+        except OverflowError:
+            return vals
+    if kinds and kinds <= {int, float}:
+        return array("d", vals)
+    return vals
+
+def columns(adata, acase:str, fields) -> dict:
+    """ Returns the (cached) columns of case 'acase', for the given fields;
+    key None holds the records themselves.
+    """
+    adata.get_case_root(acase)
+    cache = adata.index.column_cache(acase)
+    if None not in cache:
+        cache[None] = [item for item in adata.get_case(acase) if item["Id"] > 0]
+    for field in fields:
+        if field not in cache:
+            cache[field] = to_column(cache[None], field)
+    return cache
+
+def group_by(adata, acase:str, by=(), **aggs) -> list:
+    """ Returns one dictionary per group (ordered by group key values), e.g.
+	group_by(adata, "sample", ["Key"], n=("count", None), last=("max", "Mark"))
+    Each aggregation is (function, field): function is one of AGGREGATES;
+    'count' with field None counts records, otherwise non-null values.
+    Null values are ignored by all other functions.
+    """
+    by = (by,) if isinstance(by, str) else tuple(by)
+    for name, (func, field) in aggs.items():
+        assert func in AGGREGATES, f"Invalid aggregate: {name}={func}"
+        assert field is not None or func == "count", name
+    fields = set(by) | {field for _, field in aggs.values() if field is not None}
+    cols = columns(adata, acase, sorted(fields))
+    if by not in cols:
+        # Groups are cached as well, keyed by the tuple of fields
+        keys, codes = group_codes([cols[field] for field in by], len(cols[None]))
+        cols[by] = (keys, codes, group_members(codes, len(keys)))
+    keys, codes, members = cols[by]
+    res = [dict(zip(by, key)) for key in keys]
+    for name, (func, field) in aggs.items():
+        col = None if field is None else cols[field]
+        for dct, aval in zip(res, aggregate(func, col, codes, members)):
+            dct[name] = aval
+    order = sorted(range(len(keys)), key=lambda idx: order_key(freeze(keys[idx])))
+    return [res[idx] for idx in order]
+
+def group_codes(cols:list, size:int) -> tuple:
+    """ Returns the distinct group keys, and the group index of each row. """
+    if not cols:
+        return [()], array("q", [0]) * size
+    groups = {}
+    codes = array("q")
+    plain = all(hashable(col) for col in cols)
+    for key in zip(*cols):
+        if not plain:
+            key = tuple(freeze(aval) for aval in key)
+        code = groups.get(key)
+        if code is None:
+            code = len(groups)
+            groups[key] = code
+        codes.append(code)
+    return list(groups), codes
+
+def hashable(col) -> bool:
+    """ Returns True if column values can be used as keys as they are. """
+    if isinstance(col, array):
+        return True
+    return not any(isinstance(aval, (list, dict)) for aval in col)
+
+def aggregate(func:str, col, codes, members:list) -> list:
+    """ Returns the aggregate of each group.
+    :param members: row positions of each group
+    """
+    if func == "count" and col is None:
+        return [len(pos) for pos in members]
+    if isinstance(col, array) and numpy is not None and func in ("count", "sum", "min", "max"):
+        return np_aggregate(func, col, codes, len(members))
+    if not isinstance(col, array):
+        # Skip null values
+        members = [[idx for idx in pos if col[idx] is not None] for pos in members]
+    if func == "count":
+        return [len(pos) for pos in members]
+    if func == "distinct":
+        return [len({freeze(col[idx]) for idx in pos}) for pos in members]
+    if func == "sum":
+        return [sum(map(col.__getitem__, pos)) for pos in members]
+    reduce = min if func == "min" else max
+    if isinstance(col, array):
+        return [reduce(map(col.__getitem__, pos)) if pos else None for pos in members]
+    return [
+        reduce(map(col.__getitem__, pos), key=order_key) if pos else None for pos in members
+    ]
+
+def group_members(codes, num:int) -> list:
+    """ Returns the row positions of each group. """
+    members = [[] for _ in range(num)]
+    for idx, code in enumerate(codes):
+        members[code].append(idx)
+    return members
+
+def np_aggregate(func:str, col, codes, num:int) -> list:
+    """ Aggregates a numeric column with numpy. """
+    vals = numpy.frombuffer(col, dtype=numpy.int64 if col.typecode == "q" else numpy.float64)
+    where = numpy.frombuffer(codes, dtype=numpy.int64)
+    counts = numpy.bincount(where, minlength=num)
+    if func == "count":
+        return counts.tolist()
+    if func == "sum":
+        res = numpy.zeros(num, dtype=vals.dtype)
+        numpy.add.at(res, where, vals)
+        return res.tolist()
+    if col.typecode == "q":
+        limits = numpy.iinfo(numpy.int64)
+        lowest, highest = limits.min, limits.max
+    else:
+        lowest, highest = -numpy.inf, numpy.inf
+    if func == "min":
+        res = numpy.full(num, highest, dtype=vals.dtype)
+        numpy.minimum.at(res, where, vals)
+    else:
+        res = numpy.full(num, lowest, dtype=vals.dtype)
+        numpy.maximum.at(res, where, vals)
+    return [aval if cnt else None for aval, cnt in zip(res.tolist(), counts.tolist())]
+
+# Main script
+if __name__ == "__main__":
+    print("Please import me!")
@@ -5,6 +5,8 @@
 
 # pylint: disable=missing-function-docstring
 
+from jdba.jfields import new_index, EQUALITY_KINDS, order_key, freeze
+
 COMMON_FIELDS = (
     "idx",	# 0: '!xxx', 1: Case1, 2: Case2, ...
     "case",	# '!': '!xxx', 'Case1': 'Case1', ...
@@ -12,6 +14,9 @@ COMMON_FIELDS = (
     "hash",	# byname["hash"]["Case1"] = ...(**)...
 )
 
+MAX_KEY_ORDERS = 1024	# distinct record key sets remembered, see key_order()
+KEY_ORDERS = {}		# record keys (as is): sorted keys, except 'Id'
+
 class GeneralIndex():
     """ Abstract class for indexing
     """
@@ -32,6 +37,10 @@ class JIndex(GeneralIndex):
     def __init__(self, name=""):
         super().__init__(name)
         self._seqid = {}
+        self._fields = {}	# secondary indexes, by case name and (kind, spec)
+        self._names = {}	# memoized _best_name(), by case name and Id
+        self._pending = []	# field indexes declared before indexing
+        self._columns = {}	# column cache (see jgroup), by case name
 
     def get_sequence_ids(self) -> dict:
         return self._seqid
@@ -52,31 +61,391 @@ class JIndex(GeneralIndex):
 
     def do_id_hash(self) -> list:
         """ Returns the list of normalized cases.
+        A full rebuild: record names are computed again (and memoized afresh),
+        records may have been edited in place since.
         """
         res = []
         if not self.byname:
             return res
         self._hash = {}
+        self.forget_names()
         for acase, data in self.byname["ptr"].items():
-            mash = {}
-            self._hash[acase] = mash
-            if isinstance(data, list) and data:
-                is_ok = False
-                last = data[-1]
-                an_id = last.get("Id")
-                if an_id == 0:
-                    is_ok = self._do_id_index(mash, data, last)
-                if is_ok:
-                    res.append(acase)
+            if self._hash_case(self._hash, acase, data):
+                res.append(acase)
+        return res
+
+    def _hash_case(self, hashes:dict, acase:str, data, cached=True) -> bool:
+        """ Hashes one case; record names are memoized, unless 'cached' is False. """
+        mash = {}
+        hashes[acase] = mash
+        if isinstance(data, list) and data:
+            last = data[-1]
+            an_id = last.get("Id")
+            if an_id == 0:
+                memo = self._names.get(acase, {}) if cached else {}
+                names = {}
+                is_ok = self._do_id_index(mash, data, last, (memo, names))
+                if cached:
+                    self._names[acase] = names
+                return is_ok
+        return False
+
+    def column_cache(self, acase:str) -> dict:
+        """ Returns the column cache of a case, dropped whenever the case changes. """
+        return self._columns.setdefault(acase, {})
+
+    def forget_columns(self, acase:str="") -> bool:
+        """ Drops cached columns (of one case, or all). """
+        if acase:
+            return self._columns.pop(acase, None) is not None
+        self._columns = {}
+        return True
+
+    def forget_names(self, acase:str="") -> bool:
+        """ Drops memoized record names (of one case, or all). """
+        if acase:
+            return self._names.pop(acase, None) is not None
+        self._names = {}
+        return True
+
+    def _named(self, acase:str, item) -> tuple:
+        """ Returns _best_name() of a record, memoized by Id.
+        A memoized name is valid while the record is the same object
+        and it was not changed: see on_update(), and refresh() or do_id_hash()
+        after direct edits.
+        """
+        memo = self._names.setdefault(acase, {})
+        an_id = item["Id"]
+        there = memo.get(an_id)
+        if there is not None and there[0] is item and there[1] == JIndex.do_jstrip:
+            return there[2]
+        res = self._best_name(item, JIndex.do_jstrip)
+        memo[an_id] = (item, JIndex.do_jstrip, res)
+        return res
+
+    def name_of(self, key:str) -> str:
+        """ Returns the case name (as in 'byname'), given the case key. """
+        for name, there in self.byname.get("case", {}).items():
+            if there == key:
+                return name
+        return ""
+
+    def refresh(self, acase:str="") -> bool:
+        """ Rebuilds Id hashes and field indexes, after direct edits of case(s). """
+        if not self.byname:
+            return False
+        self.forget_names(acase)
+        self.forget_columns(acase)
+        if acase:
+            self.rehash(acase)
+        elif self._hash:
+            self.do_id_hash()
+        for name, fixes in self._fields.items():
+            if acase and name != acase:
+                continue
+            for fix in fixes.values():
+                fix.build(self.get_ptr(name))
+        return True
+
+    def field_indexes(self, acase:str) -> dict:
+        """ Returns the secondary indexes of a case, by (kind, spec), e.g. ('hash', 'Key+Mark') """
+        return self._fields.get(acase, {})
+
+    def field_index(self, acase:str, fields, kind:str="hash"):
+        """ Returns the secondary index of this kind on field(s) of a case, or None. """
+        spec = fields if isinstance(fields, str) else "+".join(fields)
+        return self._fields.get(acase, {}).get((kind, spec))
+
+    def add_field_index(self, acase:str, fields, kind:str="hash"):
+        """ Declares (and builds) a secondary index on field(s) of a case. """
+        fix = new_index(fields, kind)
+        self._fields.setdefault(acase, {})[(kind, fix.spec())] = fix
+        if self.byname:
+            fix.build(self.get_ptr(acase))
+        else:
+            self._pending.append((acase, fix))
+        return fix
+
+    def build_pending(self) -> int:
+        """ Builds field indexes declared before 'byname' was available. """
+        num = 0
+        for acase, fix in self._pending:
+            if acase not in self.byname["ptr"]:
+                continue
+            if self.field_index(acase, fix.spec(), fix.kind) is fix:
+                fix.build(self.get_ptr(acase))
+                num += 1
+        self._pending = []
+        return num
+
+    def drop_field_index(self, acase:str, fields, kind:str="hash") -> bool:
+        spec = fields if isinstance(fields, str) else "+".join(fields)
+        return self._fields.get(acase, {}).pop((kind, spec), None) is not None
+
+    def find(self, acase:str, **values) -> list:
+        """ Returns the records (in list order) whose fields have the given values;
+        records with Id <= 0 are not considered.
+        Uses a secondary index covering the fields, if any; otherwise scans the case.
+        """
+        data = self.get_ptr(acase)
+        fix = self.covering(acase, values)
+        if fix is None:
+            return scan(data, values)
+        where = self.where_ids(acase)
+        if not where:
+            return scan(data, values)
+        ids = fix.lookup(fix.key_from(values))
+        res = [data[pos] for pos in sorted(where[an_id] for an_id in ids)]
+        if len(fix.fields) < len(values):
+            res = [item for item in res if matches(item, values)]
         return res
 
-    def _do_id_index(self, mash, data, last:dict) -> bool:
+    def find_range(self, acase:str, field, low=None, high=None, inclusive=(True, True)) -> list:
+        """ Returns the records whose 'field' value is between low and high
+        (None: unbounded), in value order; uses a sorted index on 'field'.
+        """
+        fix = self.sorted_index(acase, field)
+        data = self.get_ptr(acase)
+        where = self.where_ids(acase)
+        if not where:
+            # Duplicate Ids (or no records): Ids do not tell records apart
+            return scan_range(data, fix, low, high, inclusive)
+        return [data[where[an_id]] for an_id in fix.irange(low, high, inclusive)]
+
+    def where_ids(self, acase:str) -> dict:
+        """ Returns the Id to list index dictionary of a case (hashed now, if needed);
+        empty if the case has duplicate Ids.
+        """
+        if acase not in self._hash:
+            self._hash_case(self._hash, acase, self.get_ptr(acase))
+        if not self._hash[acase]:
+            return {}
+        return self.id_to_idx(acase)
+
+    def find_value(self, acase:str, aval:str) -> list:
+        """ Returns the records (in list order) with any string field equal to 'aval';
+        uses (and builds, if needed) the 'values' index of the case.
+        """
+        fix = self.field_index(acase, "*", "values")
+        if fix is None:
+            fix = self.add_field_index(acase, "*", "values")
+        data = self.get_ptr(acase)
+        where = self.where_ids(acase)
+        if not where:
+            # Duplicate Ids (or no records): scan, as find() does
+            return [item for item in data if item["Id"] > 0 and aval in fix.strings_of(item)]
+        return [data[pos] for pos in sorted(where[an_id] for an_id in fix.lookup(aval))]
+
+    def search(self, acase:str, text:str, mode:str="and", fields=None) -> list:
+        """ Returns (record, score) pairs, best first, of records whose text fields
+        have all ('and') or any ('or') of the words of 'text'.
+        Uses the 'text' index on 'fields', or the only text index of the case.
+        """
+        texts = [fix for fix in self.field_indexes(acase).values() if fix.kind == "text"]
+        if fields is not None:
+            fields = (fields,) if isinstance(fields, str) else tuple(fields)
+            texts = [fix for fix in texts if fix.fields == fields]
+        assert len(texts) == 1, f"search(): {len(texts)} text index(es) for {acase}"
+        data = self.get_ptr(acase)
+        ranked = texts[0].search(text, mode)
+        where = self.where_ids(acase)
+        if not where:
+            # Duplicate Ids (or no records): an Id stands for its records having the text
+            items = {}
+            for item in data:
+                if item["Id"] > 0:
+                    items.setdefault(item["Id"], []).append(item)
+            return [
+                (item, score) for an_id, score in ranked
+                for item in items.get(an_id, ()) if texts[0].has_text(item, text, mode)
+            ]
+        return [(data[where[an_id]], score) for an_id, score in ranked]
+
+    def sorted_index(self, acase:str, field):
+        """ Returns the sorted index on 'field' (built now, if not declared). """
+        fields = (field,) if isinstance(field, str) else tuple(field)
+        fix = self.field_index(acase, fields, "sorted")
+        if fix is None:
+            fix = self.add_field_index(acase, fields, "sorted")
+        return fix
+
+    def text_index(self, acase:str, fields):
+        """ Returns the text index on 'fields' (built now, if not declared). """
+        fields = (fields,) if isinstance(fields, str) else tuple(fields)
+        fix = self.field_index(acase, fields, "text")
+        if fix is None:
+            fix = self.add_field_index(acase, fields, "text")
+        return fix
+
+    def snapshot(self) -> dict:
+        """ Returns the computed indexes (but not the data they point to),
+        as plain data; see restore().
+        """
+        fields = {
+            name: {key: (fix.kind, fix.fields, fix.snapshot()) for key, fix in fixes.items()}
+            for name, fixes in self._fields.items()
+        }
+        res = {
+            "byname": {key: self.byname[key] for key in ("idx", "case")},
+            "hash": self._hash,
+            "fields": fields,
+        }
+        return res
+
+    def restore(self, snap:dict, data:dict) -> bool:
+        """ Sets indexes from snapshot(), for the same 'data' (the box content). """
+        byname = snap["byname"]
+        cases = byname["case"]
+        if any(key not in data for key in cases.values()):
+            return False
+        self.byname = {
+            "idx": byname["idx"],
+            "case": cases,
+            "ptr": {name: data[key] for name, key in cases.items()},
+        }
+        self._hash = snap["hash"]
+        self._names = {}
+        self._columns = {}
+        self._fields = {}
+        for name, fixes in snap["fields"].items():
+            for kind, fields, state in fixes.values():
+                fix = new_index(fields, kind)
+                fix.restore(state)
+                self._fields.setdefault(name, {})[(kind, fix.spec())] = fix
+        return True
+
+    def covering(self, acase:str, values):
+        """ Returns the best index for these field values, or None. """
+        best = None
+        for fix in self._fields.get(acase, {}).values():
+            if fix.kind not in EQUALITY_KINDS:
+                continue
+            if not set(fix.fields) <= set(values):
+                continue
+            if best is None or len(fix.fields) > len(best.fields):
+                best = fix
+        return best
+
+    def rehash(self, acase:str) -> bool:
+        """ Rebuilds Id hashes of one case (only if already hashed). """
+        if acase not in self._hash:
+            return False
+        return self._hash_case(self._hash, acase, self.get_ptr(acase))
+
+    def on_insert(self, acase:str, idx:int, item) -> bool:
+        """ Updates indexes after 'item' was inserted at list index 'idx'. """
+        for fix in self.field_indexes(acase).values():
+            fix.add(item)
+        self._columns.pop(acase, None)
+        return self._hash_insert(acase, idx, item)
+
+    def on_update(self, acase:str, idx:int, old, item) -> bool:
+        """ Updates indexes after the record at 'idx' changed from 'old' to 'item'. """
+        for fix in self.field_indexes(acase).values():
+            fix.remove(old)
+            fix.add(item)
+        self._names.get(acase, {}).pop(item["Id"], None)
+        self._columns.pop(acase, None)
+        return self._hash_update(acase, idx, old, item)
+
+    def on_remove(self, acase:str, idx:int, item) -> bool:
+        """ Updates indexes after 'item' was removed from list index 'idx'. """
+        for fix in self.field_indexes(acase).values():
+            fix.remove(item)
+        self._names.get(acase, {}).pop(item["Id"], None)
+        self._columns.pop(acase, None)
+        return self._hash_remove(acase, idx, item)
+
+    def _hash_insert(self, acase:str, idx:int, item) -> bool:
+        mash = self._hash.get(acase)
+        if not mash or None in mash["id-to-idx"]:
+            return self.rehash(acase)
+        data = self.get_ptr(acase)
+        where = mash["id-to-idx"]
+        an_id = item["Id"]
+        if an_id in where:
+            # Duplicate Id: let the full indexing report it
+            return self.rehash(acase)
+        if idx < len(data) - 2:
+            for key, pos in where.items():
+                if pos >= idx:
+                    where[key] = pos + 1
+        if an_id <= 0:
+            return True
+        where[an_id] = idx
+        _, namer = self._named(acase, item)
+        name_to_id = mash["name-to-id"]
+        if namer in name_to_id:
+            if name_to_id["~"] or where[name_to_id[namer]] > idx:
+                # Full indexing would show another record as duplicate
+                return self.rehash(acase)
+            name_to_id["~"] = [("dupname", [(an_id, namer, ("first", name_to_id[namer]))])]
+        else:
+            name_to_id[namer] = an_id
+        mash["id-to-name"][an_id] = namer
+        return True
+
+    def _hash_update(self, acase:str, idx:int, old, item) -> bool:
+        mash = self._hash.get(acase)
+        if not mash or None in mash["id-to-idx"]:
+            return self.rehash(acase)
+        an_id = item["Id"]
+        assert old["Id"] == an_id, f"{acase}: Id changed, {an_id}"
+        if an_id <= 0:
+            return True
+        name_to_id = mash["name-to-id"]
+        was = mash["id-to-name"][an_id]
+        _, namer = self._named(acase, item)
+        if namer == was:
+            return True
+        if name_to_id["~"] or namer in name_to_id:
+            return self.rehash(acase)
+        del name_to_id[was]
+        name_to_id[namer] = an_id
+        mash["id-to-name"][an_id] = namer
+        return True
+
+    def _hash_remove(self, acase:str, idx:int, item) -> bool:
+        mash = self._hash.get(acase)
+        if not mash or None in mash["id-to-idx"]:
+            return self.rehash(acase)
+        an_id = item["Id"]
+        name_to_id = mash["name-to-id"]
+        if an_id > 0 and name_to_id["~"]:
+            return self.rehash(acase)
+        where = mash["id-to-idx"]
+        if an_id > 0:
+            del where[an_id]
+            del name_to_id[mash["id-to-name"].pop(an_id)]
+        for key, pos in where.items():
+            if pos > idx:
+                where[key] = pos - 1
+        return True
+
+    def check_consistency(self, acase:str="") -> str:
+        """ Compares (incrementally maintained) hashes with a full rebuild.
+        Returns an empty string if they match.
+        """
+        names = [acase] if acase else sorted(self._hash)
+        fresh = {}
+        for name in names:
+            if name not in self._hash:
+                return f"Not hashed: {name}"
+            self._hash_case(fresh, name, self.get_ptr(name), cached=False)
+            if fresh[name] != self._hash[name]:
+                return f"Inconsistent hashes: {name}"
+        return ""
+
+    def _do_id_index(self, mash, data, last:dict, names=None) -> bool:
         """ Indexes:
 		"Id": from numerical id to name
 		pos.
 		pos.
 		pos.
+        :param names: pair of (previous, new) memoized names, by Id
         """
+        memo, named = names if names else ({}, {})
+        j_strip = JIndex.do_jstrip
         assert last["Id"] == 0, 'Expected last "Id: 0"'
         id_to_name, name_to_id = {}, {}
         knames = {
@@ -94,7 +463,12 @@ class JIndex(GeneralIndex):
                 msgs.append(msg)
             else:
                 where[an_id] = idx
-            whot, namer = self._best_name(item, JIndex.do_jstrip)
+            there = memo.get(an_id)
+            if there is not None and there[0] is item and there[1] == j_strip:
+                whot, namer = there[2]
+            else:
+                whot, namer = self._best_name(item, j_strip)
+            named[an_id] = (item, j_strip, (whot, namer))
             if knames["keying"]:
                 if whot not in knames["keying"]:
                     knames["keying"].append(whot)
@@ -119,9 +493,7 @@ class JIndex(GeneralIndex):
         if "Name" in dct:
             return "Name", dct["Name"]
         tics, keying = [], []
-        for key in sorted(dct):
-            if key == "Id":
-                continue
+        for key in key_order(dct):
             aval = dct[key]
             if isinstance(aval, (str, float, int)):
                 keying.append(key)
@@ -131,3 +503,46 @@ class JIndex(GeneralIndex):
             astr = astr.rstrip('|')
         res = ('+'.join(keying), astr)
         return res
+
+def key_order(dct) -> tuple:
+    """ Returns the sorted keys of a record, except 'Id';
+    computed once per distinct key set (records of a case usually share it).
+    """
+    keys = tuple(dct)
+    res = KEY_ORDERS.get(keys)
+    if res is None:
+        if len(KEY_ORDERS) >= MAX_KEY_ORDERS:
+            KEY_ORDERS.clear()
+        res = tuple(key for key in sorted(keys) if key != "Id")
+        KEY_ORDERS[keys] = res
+    return res
+
+def scan(data, values:dict) -> list:
+    return [item for item in data if item["Id"] > 0 and matches(item, values)]
+
+def scan_range(data, fix, low, high, inclusive=(True, True)) -> list:
+    """ Returns the records (Id > 0) whose keys, for the sorted index 'fix',
+    are between low and high; in key order, as fix.irange() would.
+    """
+    low_incl, high_incl = inclusive
+    low_key = None if low is None else order_key(freeze(low))
+    high_key = None if high is None else order_key(freeze(high))
+    found = []
+    for pos, item in enumerate(data):
+        if item["Id"] <= 0:
+            continue
+        key = order_key(fix.key_of(item))
+        if low_key is not None and (key < low_key or (key == low_key and not low_incl)):
+            continue
+        if high_key is not None and (key > high_key or (key == high_key and not high_incl)):
+            continue
+        found.append((key, item["Id"], pos))
+    found.sort()
+    return [data[pos] for _, _, pos in found]
+
+def matches(item, values:dict) -> bool:
+    """ Returns True if the record has all the given field values. """
+    for field, aval in values.items():
+        if item.get(field) != aval:
+            return False
+    return True
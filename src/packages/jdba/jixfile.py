@@ -0,0 +1,105 @@
+# jixfile.py  (c)2026  Henrique Moreira
+
+""" Persisted indexes of boxes
+
+Each box may have a sidecar ('box.json' + '.jindex') with its computed indexes:
+case names, Id hashes, and secondary (field) indexes; see JIndex.snapshot().
+The sidecar is keyed by the content hash of the box (and of its log, if any):
+any mismatch makes it invalid, and indexes are recomputed as usual.
+"""
+
+# pylint: disable=missing-function-docstring
+
+import os
+import sys
+import marshal
+from jdba.jcache import digest
+
+INDEX_SUFFIX = ".jindex"
+INDEX_MAGIC = "jdb-index-1"
+LOG_SUFFIX = ".log"	# as jbox.LOG_SUFFIX
+
+
+def box_key(path:str) -> tuple:
+    """ Returns the key identifying the current content of the box (and its log). """
+    with open(path, "rb") as fdin:
+        content = fdin.read()
+    try:
+        with open(path + LOG_SUFFIX, "rb") as fdin:
+            logged = fdin.read()
+    except FileNotFoundError:
+        logged = b""
+    return key_of(digest(content), digest(logged) if logged else "")
+
+def key_of(base:str, logged:str) -> tuple:
+    """ Returns the box key from the content hashes of the box and its log (if any). """
+    return (INDEX_MAGIC, tuple(sys.version_info[:2]), base, logged)
+
+def box_sig(path:str) -> tuple:
+    """ Returns the size and modification time of the box file and of its log. """
+    res = []
+    for there in (path, path + LOG_SUFFIX):
+        try:
+            stt = os.stat(there)
+        except FileNotFoundError:
+            res.append(None)
+            continue
+        res.append((stt.st_size, stt.st_mtime_ns))
+    return tuple(res)
+
+def memo_key(path:str, memo:dict):
+    """ Returns box_key(), memoized in 'memo' (by path) as long as the box file
+    and its log keep their size and modification time; None if there is no box file.
+    """
+    sig = box_sig(path)
+    there = memo.get(path)
+    if there is not None and there[0] == sig:
+        return there[1]
+    try:
+        key = box_key(path)
+    except FileNotFoundError:
+        key = None
+    memo[path] = (sig, key)
+    return key
+
+def fetch(path:str, key=None):
+    """ Returns the persisted indexes of the box at 'path', or None if not valid.
+    :param key: the current box_key(), if known
+    """
+    try:
+        with open(path + INDEX_SUFFIX, "rb") as fdin:
+            alen = int.from_bytes(fdin.read(4), "little")
+            there = marshal.loads(fdin.read(alen))
+            if there != (box_key(path) if key is None else key):
+                return None
+            snap = marshal.loads(fdin.read())
+    except (FileNotFoundError, EOFError, ValueError, TypeError):
+        return None
+    return snap
+
+def store(path:str, snap:dict, key=None) -> bool:
+    """ Persists indexes of the box at 'path'; returns False if not possible. """
+    try:
+        head = marshal.dumps(box_key(path) if key is None else key)
+        astr = len(head).to_bytes(4, "little") + head + marshal.dumps(snap)
+    except (FileNotFoundError, ValueError):
+        return False
+    tmp = path + INDEX_SUFFIX + ".tmp"
+    try:
+        with open(tmp, "wb") as fdout:
+            fdout.write(astr)
+        os.replace(tmp, path + INDEX_SUFFIX)
+    except OSError:
+        return False
+    return True
+
+def drop(path:str) -> bool:
+    """ Removes the persisted indexes of 'path', if any. """
+    if not os.path.isfile(path + INDEX_SUFFIX):
+        return False
+    os.remove(path + INDEX_SUFFIX)
+    return True
+
+# Main script
+if __name__ == "__main__":
+    print("Please import me!")
@@ -0,0 +1,140 @@
+# jjoin.py  (c)2026  Henrique Moreira
+
+""" Hash joins of cases, possibly of different boxes
+
+One side (the 'build' side) is hashed by its key fields, the other side
+is streamed and probed: joined rows are yielded as (left, right) record pairs.
+Key fields declared unique in the schema (see StrictSchema.unique_fields())
+are hashed to a single record; a hash field index, if any, is used as is.
+Records with Id <= 0 are not joined; null keys never match.
+"""
+
+# pylint: disable=missing-function-docstring
+
+from jdba.jfields import freeze
+
+JOIN_KINDS = ("inner", "left")
+
+
+class Side():
+    """ One side of a join: a case, its key fields, and whether they are unique.
+    """
+    def __init__(self, adata, acase:str, fields, unique=()):
+        fields = (fields,) if isinstance(fields, str) else tuple(fields)
+        assert fields, acase
+        self.adata = adata
+        self.acase = acase
+        self.fields = fields
+        self.unique = any(set(ufields) <= set(fields) for ufields in unique)
+
+    def records(self):
+        for item in self.adata.get_case(self.acase):
+            if item["Id"] > 0:
+                yield item
+
+    def key_of(self, item):
+        key = tuple(freeze(item.get(field)) for field in self.fields)
+        if None in key:
+            return None
+        return key
+
+    def hash_index(self):
+        """ Returns the hash field index on exactly the key fields, if any. """
+        self.adata.get_case_root(self.acase)
+        return self.adata.index.field_index(self.acase, self.fields, "hash")
+
+class Join():
+    """ Join of two sides, see Database.join()
+    """
+    def __init__(self, left:Side, right:Side, how:str="inner"):
+        assert how in JOIN_KINDS, f"Invalid join: {how}"
+        assert len(left.fields) == len(right.fields), "Key fields mismatch"
+        self.left = left
+        self.right = right
+        self.how = how
+
+    def plan(self) -> dict:
+        """ Returns the join strategy:
+		"build": 'left' or 'right' (the hashed side)
+		"method": 'index' (existing hash index), 'unique-hash', or 'hash'
+        """
+        left, right = self.left, self.right
+        if right.hash_index() is not None and right.adata.index.where_ids(right.acase):
+            return {"build": "right", "method": "index"}
+        if right.unique:
+            return {"build": "right", "method": "unique-hash"}
+        if left.unique and self.how == "inner":
+            return {"build": "left", "method": "unique-hash"}
+        return {"build": "right", "method": "hash"}
+
+    def explain(self) -> str:
+        plan = self.plan()
+        build = getattr(self, plan["build"])
+        probe = self.left if build is self.right else self.right
+        return (
+            f"{self.how} join; {plan['method']} {build.acase}:{'+'.join(build.fields)}"
+            f"; probe {probe.acase}:{'+'.join(probe.fields)}"
+        )
+
+    def __iter__(self):
+        return self.rows()
+
+    def rows(self):
+        """ Yields (left, right) pairs; right is None for unmatched left records
+        of a 'left' join.
+        """
+        plan = self.plan()
+        if plan["build"] == "left":
+            table = build_table(self.left, True)
+            for item in self.right.records():
+                there = table.get(self.right.key_of(item))
+                if there is not None:
+                    yield there, item
+            return
+        if plan["method"] == "index":
+            probe = self._index_probe()
+        else:
+            probe = build_table(self.right, plan["method"] == "unique-hash").get
+        unique = plan["method"] == "unique-hash"
+        for item in self.left.records():
+            key = self.left.key_of(item)
+            there = None if key is None else probe(key)
+            if not there:
+                if self.how == "left":
+                    yield item, None
+                continue
+            if unique:
+                yield item, there
+                continue
+            for other in there:
+                yield item, other
+
+    def _index_probe(self):
+        side = self.right
+        fix = side.hash_index()
+        data = side.adata.get_case(side.acase)
+        where = side.adata.index.where_ids(side.acase)
+
+        def probe(key):
+            ids = fix.lookup(key[0] if len(key) == 1 else key)
+            return [data[pos] for pos in sorted(where[an_id] for an_id in ids)]
+        return probe
+
+def build_table(side:Side, unique:bool) -> dict:
+    """ Hashes the records of one side by key:
+    key -> record (unique), or key -> list of records.
+    """
+    table = {}
+    for item in side.records():
+        key = side.key_of(item)
+        if key is None:
+            continue
+        if unique:
+            table.setdefault(key, item)
+        else:
+            table.setdefault(key, []).append(item)
+    return table
+
+# Main script
+if __name__ == "__main__":
+    print("Please import me!")
@@ -0,0 +1,101 @@
+# jpattern.py  (c)2026  Henrique Moreira
+
+""" Case templates: matching concrete URLs (or keys) to cases
+
+A case key may hold a template after '=', e.g.
+	youtube-index=https://www.youtube.com/watch?v=$1&list=$2&index=$3
+where '$1', '$2', ... stand for any (non-empty) text.
+Templates are kept in a trie, by their literal prefix (the text before the first
+placeholder): only templates whose prefix starts the URL are tried,
+each with its own compiled pattern.
+"""
+
+# pylint: disable=missing-function-docstring
+
+import re
+
+PLACEHOLDER = re.compile(r"\$(\d+)")
+
+
+def template_of(key:str) -> str:
+    """ Returns the template part of a case key, or an empty string. """
+    if "=" not in key:
+        return ""
+    return key.split("=", maxsplit=1)[1]
+
+def compile_template(tmpl:str) -> tuple:
+    """ Returns the literal prefix of a template, and its compiled pattern.
+    A placeholder used twice must match the same text.
+    """
+    parts = PLACEHOLDER.split(tmpl)
+    astr, seen = "", set()
+    for idx, part in enumerate(parts):
+        if idx % 2 == 0:
+            astr += re.escape(part)
+        elif part in seen:
+            astr += f"(?P=p{part})"
+        else:
+            seen.add(part)
+            astr += f"(?P<p{part}>.+?)"
+    return parts[0], re.compile(astr + r"\Z", re.DOTALL)
+
+class PatternIndex():
+    """ Index of case templates (of one or more boxes)
+    """
+    def __init__(self, name=""):
+        assert isinstance(name, str)
+        self.name = name
+        self._trie = {}		# char: node; key None holds the templates ending there
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, box:str, key:str) -> bool:
+        """ Adds the template of case 'key' (of 'box'); returns False if it has none. """
+        tmpl = template_of(key)
+        if not tmpl:
+            return False
+        prefix, pattern = compile_template(tmpl)
+        node = self._trie
+        for achr in prefix:
+            node = node.setdefault(achr, {})
+        name = key.split("=", maxsplit=1)[0]
+        node.setdefault(None, []).append((box, name, len(prefix), pattern))
+        self._size += 1
+        return True
+
+    def add_box(self, box:str, keys) -> int:
+        """ Adds templates of all cases of a box; returns how many were added. """
+        return sum(self.add(box, key) for key in keys if not key.startswith(("!", "~")))
+
+    def candidates(self, text:str) -> list:
+        """ Returns the templates whose literal prefix starts 'text'. """
+        res = []
+        node = self._trie
+        res += node.get(None, [])
+        for achr in text:
+            node = node.get(achr)
+            if node is None:
+                break
+            res += node.get(None, [])
+        return res
+
+    def match(self, text:str) -> list:
+        """ Returns (box, case name, captures) of the templates matching 'text',
+        most specific (longest literal prefix) first;
+        captures are by placeholder number, e.g. {1: 'dvm3QY-e-ts', ...}
+        """
+        res = []
+        for box, name, size, pattern in self.candidates(text):
+            found = pattern.match(text)
+            if found is None:
+                continue
+            captures = {int(key[1:]): aval for key, aval in found.groupdict().items()}
+            res.append((-size, box, name, captures))
+        res.sort(key=lambda tup: tup[:3])
+        return [tup[1:] for tup in res]
+
+# Main script
+if __name__ == "__main__":
+    print("Please import me!")
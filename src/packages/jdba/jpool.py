@@ -0,0 +1,81 @@
+# jpool.py  (c)2026  Henrique Moreira
+
+""" Value pool: interning of keys and deduplication of repeated values
+
+After decoding, each occurrence of a string (or number) is a separate object;
+a pool, usually one per database, keeps a single object per distinct value.
+"""
+
+# pylint: disable=missing-function-docstring
+
+import sys
+import threading
+
+
+class ValuePool():
+    """ Pool of (immutable) scalar values, shared by several boxes.
+    """
+    def __init__(self, name=""):
+        assert isinstance(name, str)
+        self.name = name
+        self._values = {
+            str: {},
+            int: {},
+            float: {},
+        }
+        self._lock = threading.Lock()
+        self._counted = set()
+        self._stats = {
+            "hits": 0,
+            "saved": 0,	# bytes
+        }
+
+    def report(self) -> dict:
+        """ Returns pool statistics: distinct values, hits, and bytes saved. """
+        res = dict(self._stats)
+        res["distinct"] = sum(len(values) for values in self._values.values())
+        return res
+
+    def intern_data(self, data):
+        """ Returns data with keys interned and repeated values deduplicated;
+        dictionaries and lists are rebuilt, so data should not be in use yet.
+        """
+        with self._lock:
+            try:
+                return self._fold(data)
+            finally:
+                self._counted = set()
+
+    def _fold(self, data):
+        if isinstance(data, dict):
+            return {self._key(key): self._fold(aval) for key, aval in data.items()}
+        if isinstance(data, list):
+            return [self._fold(aval) for aval in data]
+        values = self._values.get(type(data))
+        if values is None or not data:
+            # None, booleans, ...; zeros, as 0.0 == -0.0
+            return data
+        there = values.setdefault(data, data)
+        if there is not data:
+            self._saved(data)
+        return there
+
+    def _key(self, key):
+        if not isinstance(key, str):
+            return key
+        there = sys.intern(key)
+        if there is not key:
+            self._saved(key)
+        return there
+
+    def _saved(self, obj):
+        """ Accounts for a replaced object (once, even if it occurs many times). """
+        self._stats["hits"] += 1
+        if id(obj) in self._counted:
+            return
+        self._counted.add(id(obj))
+        self._stats["saved"] += sys.getsizeof(obj)
+
+# Main script
+if __name__ == "__main__":
+    print("Please import me!")
@@ -0,0 +1,207 @@
+# jquery.py  (c)2026  Henrique Moreira
+
+""" Queries over dlist cases
+
+A query selects records of one case (Id > 0), e.g.
+	adata.query("sample").where(Key="url").order_by("Mark").limit(10).run()
+The planner uses the Id hash ('Id' equality), or a secondary index covering
+equalities (or a sorted index, for a range), and falls back to a scan;
+explain() tells which path was taken.
+"""
+
+# pylint: disable=missing-function-docstring
+
+from jdba.jindex import matches
+from jdba.jfields import order_key, freeze
+
+
+class Query():
+    """ Query on one case of an AData (see AData.query())
+    """
+    def __init__(self, adata, acase:str):
+        assert isinstance(acase, str)
+        self.acase = acase
+        self._adata = adata
+        self._values = {}	# field: value (equality)
+        self._ranges = {}	# field: (low, high), bounds included; None: unbounded
+        self._preds = []	# callables, record -> bool
+        self._fields = ()	# projection (empty: whole records)
+        self._order = []	# (field, reverse)
+        self._limit = -1
+        self._offset = 0
+
+    def where(self, **values):
+        """ Records whose fields have the given values. """
+        self._values.update(values)
+        return self
+
+    def where_range(self, field:str, low=None, high=None):
+        """ Records whose 'field' is between low and high (both included). """
+        self._ranges[field] = (low, high)
+        return self
+
+    def filter(self, pred):
+        """ Records for which pred(record) is true. """
+        assert callable(pred), self.acase
+        self._preds.append(pred)
+        return self
+
+    def select(self, *fields):
+        """ Returns only these fields of each record (as dictionaries). """
+        self._fields = fields
+        return self
+
+    def order_by(self, *fields, reverse=False):
+        """ Orders by fields; a field prefixed by '-' is in descending order. """
+        for field in fields:
+            if field.startswith("-"):
+                self._order.append((field[1:], not reverse))
+            else:
+                self._order.append((field, reverse))
+        return self
+
+    def limit(self, num:int):
+        assert num >= 0, self.acase
+        self._limit = num
+        return self
+
+    def offset(self, num:int):
+        assert num >= 0, self.acase
+        self._offset = num
+        return self
+
+    def plan(self) -> dict:
+        """ Returns the access path:
+		"path": 'id-hash', 'index', 'range', or 'scan'
+		"index": index spec (or empty)
+		"residual": fields still to be checked per record
+        """
+        self._adata.get_case_root(self.acase)
+        ixr = self._adata.index
+        values = self._values
+        res = {
+            "path": "scan",
+            "index": "",
+            "residual": self._residual((), ()),
+        }
+        if "Id" in values and self.acase in ixr.id_hash() and ixr.where_ids(self.acase):
+            res["path"], res["index"] = "id-hash", "Id"
+            res["residual"] = self._residual(("Id",), ())
+            return res
+        if not ixr.field_indexes(self.acase) or not ixr.where_ids(self.acase):
+            return res
+        fix = ixr.covering(self.acase, values) if values else None
+        if fix is not None:
+            res["path"], res["index"] = "index", f"{fix.kind}:{fix.spec()}"
+            res["residual"] = self._residual(fix.fields, ())
+            return res
+        for field in sorted(self._ranges):
+            fix = ixr.field_index(self.acase, field, "sorted")
+            if fix is not None:
+                res["path"], res["index"] = "range", f"{fix.kind}:{fix.spec()}"
+                res["residual"] = self._residual((), (field,))
+                return res
+        return res
+
+    def explain(self) -> str:
+        """ Returns a human-readable plan, e.g. 'index hash:Key; filter Mark; limit 10' """
+        plan = self.plan()
+        if plan["path"] == "scan":
+            shown = [f"scan {self.acase}"]
+        else:
+            shown = [f"{plan['path']} {plan['index']}"]
+        if plan["residual"]:
+            shown.append("filter " + ",".join(plan["residual"]))
+        if self._preds:
+            shown.append(f"predicates {len(self._preds)}")
+        if self._order:
+            shown.append("order by " + ",".join(
+                ("-" if rev else "") + field for field, rev in self._order
+            ))
+        if self._offset:
+            shown.append(f"offset {self._offset}")
+        if self._limit >= 0:
+            shown.append(f"limit {self._limit}")
+        if self._fields:
+            shown.append("select " + ",".join(self._fields))
+        return "; ".join(shown)
+
+    def run(self) -> list:
+        """ Returns the resulting records (or projections). """
+        plan = self.plan()
+        data = self._adata.get_case(self.acase)
+        items = self._candidates(plan, data)
+        if plan["residual"] or self._preds:
+            items = [item for item in items if self._accepts(item, plan["residual"])]
+        for field, reverse in reversed(self._order):
+            items = sorted(items, key=sort_key(field), reverse=reverse)
+        end = None if self._limit < 0 else self._offset + self._limit
+        if self._offset or end is not None:
+            items = items[self._offset:end]
+        if self._fields:
+            return [{field: item.get(field) for field in self._fields} for item in items]
+        return list(items)
+
+    def __iter__(self):
+        return iter(self.run())
+
+    def count(self) -> int:
+        return len(self.run())
+
+    def first(self):
+        """ Returns the first resulting record, or None. """
+        res = self.run()
+        return res[0] if res else None
+
+    def _candidates(self, plan:dict, data) -> list:
+        """ Returns the records of the access path, in list order. """
+        path = plan["path"]
+        if path == "scan":
+            return [item for item in data if item["Id"] > 0]
+        ixr = self._adata.index
+        where = ixr.where_ids(self.acase)
+        if path == "id-hash":
+            pos = where.get(self._values["Id"])
+            return [] if pos is None else [data[pos]]
+        kind, spec = plan["index"].split(":", maxsplit=1)
+        fix = ixr.field_index(self.acase, spec, kind)
+        if path == "index":
+            ids = fix.lookup(fix.key_from(self._values))
+        else:
+            low, high = self._ranges[fix.fields[0]]
+            ids = fix.irange(low, high)
+        return [data[pos] for pos in sorted(where[an_id] for an_id in ids)]
+
+    def _residual(self, equal, ranged) -> list:
+        """ Returns the fields to check, except equalities and ranges served by an index. """
+        res = {field for field in self._values if field not in equal}
+        res |= {field for field in self._ranges if field not in ranged}
+        return sorted(res)
+
+    def _accepts(self, item, residual) -> bool:
+        for field in residual:
+            if field in self._values and not matches(item, {field: self._values[field]}):
+                return False
+        for field, (low, high) in self._ranges.items():
+            if field in residual and not in_range(item.get(field), low, high):
+                return False
+        for pred in self._preds:
+            if not pred(item):
+                return False
+        return True
+
+def sort_key(field:str):
+    return lambda item: order_key(freeze(item.get(field)))
+
+def in_range(aval, low, high) -> bool:
+    """ Returns True if aval is between low and high, ordered as in sorted indexes. """
+    key = order_key(freeze(aval))
+    if low is not None and key < order_key(freeze(low)):
+        return False
+    if high is not None and key > order_key(freeze(high)):
+        return False
+    return True
+
+# Main script
+if __name__ == "__main__":
+    print("Please import me!")
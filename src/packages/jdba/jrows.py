@@ -0,0 +1,136 @@
+# jrows.py  (c)2026  Henrique Moreira
+
+""" Compact rows for dlist cases
+
+A packed case keeps one key tuple per record 'shape' (shared by all records
+with the same keys), and one value tuple per record.
+Packed records are read-only mappings: they behave like the original
+dictionaries for lookups, iteration, comparison and JSON dumps.
+"""
+
+# pylint: disable=missing-function-docstring
+
+from copy import deepcopy
+from collections.abc import Mapping
+
+MAX_SHAPES = 4		# cases with more distinct key sets are left as they are
+
+SHAPES = {}		# key tuple: Row class
+
+
+class Row(Mapping):
+    """ Compact, read-only record; keys are shared by its class.
+    """
+    __slots__ = ("_vals",)
+    _keys = ()
+    _pos = {}
+
+    def __init__(self, vals:tuple):
+        self._vals = vals
+
+    def __getitem__(self, key):
+        return self._vals[self._pos[key]]
+
+    def get(self, key, default=None):
+        idx = self._pos.get(key)
+        if idx is None:
+            return default
+        return self._vals[idx]
+
+    def __contains__(self, key):
+        return key in self._pos
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def keys(self):
+        return self._keys
+
+    def values(self):
+        return self._vals
+
+    def items(self):
+        return zip(self._keys, self._vals)
+
+    def __eq__(self, other):
+        if isinstance(other, Row) and other._keys is self._keys:
+            return self._vals == other._vals
+        return Mapping.__eq__(self, other)
+
+    __hash__ = None
+
+    def __deepcopy__(self, memo):
+        """ Copies are plain (mutable) dictionaries. """
+        return deepcopy(dict(zip(self._keys, self._vals)), memo)
+
+    def __repr__(self) -> str:
+        return repr(dict(zip(self._keys, self._vals)))
+
+class CompactCase(list):
+    """ A case (list of records) whose dictionaries are stored as Row objects.
+    Dictionaries inserted later are packed as well.
+    """
+    def __init__(self, items=()):
+        super().__init__(pack(item) for item in items)
+
+    def insert(self, index, item):
+        super().insert(index, pack(item))
+
+    def append(self, item):
+        super().append(pack(item))
+
+    def extend(self, items):
+        super().extend(pack(item) for item in items)
+
+    def __setitem__(self, index, item):
+        if isinstance(index, slice):
+            super().__setitem__(index, [pack(one) for one in item])
+        else:
+            super().__setitem__(index, pack(item))
+
+    def unpacked(self) -> list:
+        """ Returns the equivalent list of dictionaries. """
+        return [dict(item) if isinstance(item, Row) else item for item in self]
+
+def row_class(keys:tuple):
+    """ Returns the Row class for this key tuple (one class per shape). """
+    cls = SHAPES.get(keys)
+    if cls is None:
+        cls = type("Row", (Row,), {
+            "__module__": __name__,
+            "__slots__": (),
+            "_keys": keys,
+            "_pos": {key: idx for idx, key in enumerate(keys)},
+        })
+        SHAPES[keys] = cls
+    return cls
+
+def pack(item):
+    """ Returns the Row for a dictionary; anything else is kept as is. """
+    if type(item) is not dict:
+        return item
+    keys = tuple(item)
+    cls = SHAPES.get(keys)
+    if cls is None:
+        cls = row_class(keys)
+    return cls(tuple(item.values()))
+
+def packable(data) -> bool:
+    """ Returns True if 'data' is a list of dictionaries with few shapes. """
+    if not isinstance(data, list) or isinstance(data, CompactCase) or not data:
+        return False
+    shapes = set()
+    for item in data:
+        if type(item) is not dict:
+            return False
+        shapes.add(tuple(item))
+        if len(shapes) > MAX_SHAPES:
+            return False
+    return True
+
+# Main script
+if __name__ == "__main__":
+    print("Please import me!")
@@ -0,0 +1,133 @@
+# jrules.py  (c)2026  Henrique Moreira
+
+""" Field rules: types and constraints of case fields
+
+A schema UCases entry with "FieldType": "fields" holds one rule per field, e.g.
+	{"FieldType": "fields", "Id": 3, "Key": "sample", "Method": [
+	    {"Id": 1, "Field": "Mark", "Type": "date", "NotNull": true},
+	    {"Id": 2, "Field": "Key", "Type": "str", "Enum": ["url", "url2"]},
+	    {"Id": 3, "Field": "Size", "Type": "int", "Min": 0, "Max": 100},
+	    {"Id": 4, "Field": "Title", "Regex": "^[A-Z]"},
+	    {"Id": 5, "Field": "Ref", "Type": "int", "Ref": ["yes", "youtube-index"]}
+	]}
+Rules are compiled once; all rules of a case are checked in a single pass.
+Null (or missing) values only fail 'NotNull'.
+A foreign key ('Ref': box and case) must be the Id of a record there.
+"""
+
+# pylint: disable=missing-function-docstring
+
+import re
+from datetime import date
+from jdba.jfields import freeze
+
+RULE_KEYS = ("Id", "Field", "Type", "NotNull", "Enum", "Regex", "Min", "Max", "Ref")
+
+FIELD_TYPES = {
+    "any": None,
+    "str": (str,),
+    "int": (int,),
+    "float": (int, float),
+    "bool": (bool,),
+    "list": (list,),
+    "dict": (dict,),
+    "date": (str,),	# ISO date: YYYY-MM-DD
+}
+
+
+def compile_rules(methods) -> tuple:
+    """ Returns the compiled rules, as tuples:
+	(field, types, iso-date, not-null, enum, regex, low, high, ref)
+    """
+    res = []
+    for methd in methods if methods else []:
+        if methd["Id"] < 1:
+            continue
+        for key in methd:
+            assert key in RULE_KEYS, f"Invalid rule key: {key}"
+        field = methd["Field"]
+        assert field and isinstance(field, str), f"Rule Id={methd['Id']}"
+        atype = methd.get("Type", "any")
+        assert atype in FIELD_TYPES, f"Invalid type: {field}={atype}"
+        enum = methd.get("Enum")
+        regex = methd.get("Regex")
+        ref = methd.get("Ref")
+        assert ref is None or len(ref) == 2, f"Invalid Ref: {field}={ref}"
+        res.append((
+            field,
+            FIELD_TYPES[atype], atype == "date",
+            bool(methd.get("NotNull")),
+            None if enum is None else frozenset(freeze(aval) for aval in enum),
+            None if regex is None else re.compile(regex),
+            methd.get("Min"), methd.get("Max"),
+            None if ref is None else tuple(ref),
+        ))
+    return tuple(res)
+
+def refs_of(rules:tuple) -> list:
+    """ Returns the (box, case) pairs referenced by foreign keys. """
+    return sorted({rule[8] for rule in rules if rule[8] is not None})
+
+def check_rules(elems, rules:tuple, refs:dict) -> list:
+    """ Checks all rules over records (Id >= 1), in a single pass.
+    :param refs: Ids of referenced cases, by (box, case); missing ones are not checked
+    Returns (field, ids, message) triplets, in rule order.
+    """
+    found = {}
+    for item in elems:
+        an_id = item["Id"]
+        if an_id < 1:
+            continue
+        for rule in rules:
+            what = check_value(item.get(rule[0]), rule, refs)
+            if what:
+                found.setdefault((rule[0], what), []).append(an_id)
+    order = {rule[0]: idx for idx, rule in reversed(list(enumerate(rules)))}
+    keys = sorted(found, key=lambda pair: (order[pair[0]], pair[1]))
+    return [(field, found[(field, what)], f"{field}: {what}") for field, what in keys]
+
+def check_value(aval, rule:tuple, refs:dict) -> str:
+    """ Returns what is wrong with a value, or an empty string. """
+    _, types, is_date, not_null, enum, regex, low, high, ref = rule
+    if aval is None:
+        return "null" if not_null else ""
+    if types is not None:
+        if not isinstance(aval, types) or (isinstance(aval, bool) and bool not in types):
+            return f"not {type_name(types, is_date)}"
+        if is_date and not iso_date(aval):
+            return "not an iso-date"
+    if enum is not None and freeze(aval) not in enum:
+        return "not in enum"
+    if regex is not None and not (isinstance(aval, str) and regex.search(aval)):
+        return "no regex match"
+    try:
+        if low is not None and aval < low:
+            return f"below {low}"
+        if high is not None and aval > high:
+            return f"above {high}"
+    except TypeError:
+        return "not comparable"
+    if ref is not None and ref in refs and freeze(aval) not in refs[ref]:
+        return f"no {ref[0]}.{ref[1]} Id"
+    return ""
+
+def type_name(types:tuple, is_date:bool) -> str:
+    if is_date:
+        return "a date"
+    for name, there in FIELD_TYPES.items():
+        if there == types:
+            return f"{name}"
+    return "?"
+
+def iso_date(astr:str) -> bool:
+    if len(astr) != 10:
+        return False
+    try:
+        date.fromisoformat(astr)
+    except ValueError:
+        return False
+    return True
+
+# Main script
+if __name__ == "__main__":
+    print("Please import me!")
@@ -0,0 +1,116 @@
+# jstream.py  (c)2026  Henrique Moreira
+
+""" Streaming box reader
+
+Scans a box file case by case (top-level key by key), over a memory map;
+only the selected cases are decoded, the others are skipped unbuilt.
+"""
+
+# pylint: disable=missing-function-docstring
+
+import re
+import mmap
+from json import JSONDecodeError
+from jdba import jcodec
+
+INDENTED = b'{\n  "'	# canonical boxes, dumped with indent=2
+STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"')
+TOKENS = re.compile(rb'("[^"\\]*(?:\\.[^"\\]*)*")|([\[{])|([\]}])')
+SCALAR = re.compile(rb'[^,}\]\s]+')
+SPACES = re.compile(rb'\s*')
+
+
+def load_cases(path:str, cases, encoding:str) -> dict:
+    """ Returns the box at 'path', with only the wanted cases.
+    A case is wanted if its key, or its name (the key prefix before '='),
+    is within 'cases'; the header ('!...') and tail ('~') cases are always kept.
+    """
+    wanted = set(cases)
+    res = {}
+    with open(path, "rb") as fdin:
+        try:
+            buf = mmap.mmap(fdin.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file cannot be mapped
+            buf = b""
+        try:
+            for key, start, end in iter_spans(buf, encoding):
+                if is_wanted(key, wanted):
+                    res[key] = jcodec.loads(buf[start:end].decode(encoding))
+        finally:
+            if isinstance(buf, mmap.mmap):
+                buf.close()
+    return res
+
+def is_wanted(key:str, wanted:set) -> bool:
+    if key.startswith(("!", "~")):
+        return True
+    return key in wanted or key.split("=", maxsplit=1)[0] in wanted
+
+def iter_spans(buf, encoding:str):
+    """ Yields (key, start, end) for each top-level value of a JSON object. """
+    indented = buf[:len(INDENTED)] == INDENTED
+    pos = skip_spaces(buf, 0)
+    if buf[pos:pos+1] != b"{":
+        raise JSONDecodeError("Expecting '{'", "", pos)
+    pos = skip_spaces(buf, pos + 1)
+    if buf[pos:pos+1] == b"}":
+        return
+    while True:
+        match = STRING.match(buf, pos)
+        if match is None:
+            raise JSONDecodeError("Expecting property name", "", pos)
+        key = jcodec.loads(match.group().decode(encoding))
+        pos = skip_spaces(buf, match.end())
+        if buf[pos:pos+1] != b":":
+            raise JSONDecodeError("Expecting ':' delimiter", "", pos)
+        start = skip_spaces(buf, pos + 1)
+        end = skip_value(buf, start, indented)
+        yield key, start, end
+        pos = skip_spaces(buf, end)
+        delim = buf[pos:pos+1]
+        if delim == b"}":
+            return
+        if delim != b",":
+            raise JSONDecodeError("Expecting ',' delimiter", "", pos)
+        pos = skip_spaces(buf, pos + 1)
+
+def skip_spaces(buf, pos:int) -> int:
+    return SPACES.match(buf, pos).end()
+
+def skip_value(buf, pos:int, indented=False) -> int:
+    """ Returns the position right after the JSON value starting at 'pos'.
+    :param indented: True if the value is a top-level value of an indent=2 dump;
+        its closing bracket is then the first one at the start of a line
+        indented by two spaces (strings cannot hold raw new-lines).
+    """
+    first = buf[pos:pos+1]
+    if first == b'"':
+        match = STRING.match(buf, pos)
+    elif first in (b"[", b"{") and indented:
+        closing = b"]" if first == b"[" else b"}"
+        if buf[pos+1:pos+2] == closing:
+            return pos + 2
+        end = buf.find(b"\n  " + closing, pos)
+        if end < 0:
+            raise JSONDecodeError("Unterminated value", "", pos)
+        return end + 4
+    elif first in (b"[", b"{"):
+        depth = 0
+        for match in TOKENS.finditer(buf, pos):
+            if match.lastindex == 2:
+                depth += 1
+            elif match.lastindex == 3:
+                depth -= 1
+                if depth <= 0:
+                    return match.end()
+        match = None
+    else:
+        match = SCALAR.match(buf, pos)
+    if match is None:
+        raise JSONDecodeError("Unterminated value", "", pos)
+    return match.end()
+
+# Main script
+if __name__ == "__main__":
+    print("Please import me!")
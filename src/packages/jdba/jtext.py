@@ -0,0 +1,123 @@
+# jtext.py  (c)2026  Henrique Moreira
+
+""" Full-text (token) index over string fields of a case
+
+Text is normalized with jcommon.to_ascii(), lower-cased, and split into
+alphanumeric tokens. The index maps each token to the Ids of records having it,
+with the number of occurrences; search() ranks records by tf-idf.
+"""
+
+# pylint: disable=missing-function-docstring
+
+import re
+import math
+from jdba.jcommon import to_ascii
+from jdba.jfields import FieldIndex
+
+TOKEN = re.compile(r"[a-z0-9]+")
+SEARCH_MODES = ("and", "or")
+
+
+def tokenize(astr:str) -> list:
+    """ Returns the (normalized) tokens of a string. """
+    return TOKEN.findall(to_ascii(astr).lower())
+
+class TextIndex(FieldIndex):
+    """ Inverted index: token -> {Id: occurrences}
+    """
+    kind = "text"
+
+    def __init__(self, fields):
+        super().__init__(fields)
+        self._tokens = {}
+        self._docs = 0
+
+    def clear(self):
+        self._tokens = {}
+        self._docs = 0
+
+    def counts_of(self, item) -> dict:
+        """ Returns the tokens of the indexed fields of a record, with their counts. """
+        res = {}
+        for field in self.fields:
+            aval = item.get(field)
+            if not isinstance(aval, str):
+                continue
+            for token in tokenize(aval):
+                res[token] = res.get(token, 0) + 1
+        return res
+
+    def add(self, item) -> bool:
+        an_id = item["Id"]
+        if an_id <= 0:
+            return False
+        for token, num in self.counts_of(item).items():
+            self._tokens.setdefault(token, {})[an_id] = num
+        self._docs += 1
+        return True
+
+    def remove(self, item) -> bool:
+        an_id = item["Id"]
+        if an_id <= 0:
+            return False
+        counts = self.counts_of(item)
+        found = not counts
+        for token in counts:
+            posts = self._tokens.get(token)
+            if not posts or an_id not in posts:
+                continue
+            found = True
+            del posts[an_id]
+            if not posts:
+                del self._tokens[token]
+        if found:
+            self._docs -= 1
+        return found
+
+    def lookup(self, key) -> list:
+        """ Returns the Ids of records with this token. """
+        return sorted(self._tokens.get(key, ()))
+
+    def search(self, text:str, mode:str="and") -> list:
+        """ Returns (Id, score) pairs, best first, of records having
+        all ('and') or any ('or') of the tokens of 'text'.
+        """
+        assert mode in SEARCH_MODES, f"Invalid search mode: {mode}"
+        terms = sorted(set(tokenize(text)))
+        if not terms:
+            return []
+        posts = [self._tokens.get(term, {}) for term in terms]
+        if mode == "and":
+            ids = set(min(posts, key=len))
+            for there in posts:
+                ids.intersection_update(there)
+        else:
+            ids = set().union(*posts)
+        scores = dict.fromkeys(ids, 0.0)
+        for there in posts:
+            if not there:
+                continue
+            idf = math.log(1 + self._docs / len(there))
+            for an_id in ids.intersection(there):
+                scores[an_id] += there[an_id] * idf
+        return sorted(scores.items(), key=lambda pair: (-pair[1], pair[0]))
+
+    def has_text(self, item, text:str, mode:str="and") -> bool:
+        """ Returns True if the record has all ('and') or any ('or') of the tokens of 'text'. """
+        terms = set(tokenize(text))
+        there = self.counts_of(item)
+        if mode == "and":
+            return bool(terms) and all(term in there for term in terms)
+        return any(term in there for term in terms)
+
+    def snapshot(self):
+        return (self._tokens, self._docs)
+
+    def restore(self, state) -> bool:
+        self._tokens, self._docs = state
+        assert isinstance(self._tokens, dict), self.spec()
+        return True
+
+# Main script
+if __name__ == "__main__":
+    print("Please import me!")
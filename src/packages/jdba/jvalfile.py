@@ -0,0 +1,64 @@
+# jvalfile.py  (c)2026  Henrique Moreira
+
+""" Persisted validation results
+
+A database directory may have a 'jdb.valid' file, listing the boxes last found
+valid, each keyed by the schema content hash, the content hash of the box
+(and of its log, see jixfile.box_key()), and those of the boxes it references
+(foreign keys). A box whose key still matches needs no validation.
+Content keys are memoized (jixfile.memo_key(), JBox.content_key()):
+files are hashed again only when they change.
+"""
+
+# pylint: disable=missing-function-docstring
+
+import os
+import marshal
+
+VALID_NAME = "jdb.valid"
+VALID_MAGIC = "jdb-valid-1"
+
+
+def valid_key(schema:tuple, key:tuple, refs=()) -> tuple:
+    """ Returns the key of a valid box, or None if any content key is unknown.
+    :param schema: the content key of the schema
+    :param key: the content key of the box
+    :param refs: content keys of the referenced boxes
+    """
+    if schema is None or key is None or None in refs:
+        return None
+    return (VALID_MAGIC, schema, key, tuple(refs))
+
+def fetch(adir:str) -> dict:
+    """ Returns the keys of the boxes last found valid, by box name. """
+    try:
+        with open(os.path.join(adir, VALID_NAME), "rb") as fdin:
+            res = marshal.loads(fdin.read())
+    except (FileNotFoundError, EOFError, ValueError, TypeError):
+        return {}
+    return res if isinstance(res, dict) else {}
+
+def store(adir:str, keys:dict) -> bool:
+    """ Persists the keys of valid boxes; returns False if not possible. """
+    path = os.path.join(adir, VALID_NAME)
+    tmp = path + ".tmp"
+    try:
+        astr = marshal.dumps(keys)
+        with open(tmp, "wb") as fdout:
+            fdout.write(astr)
+        os.replace(tmp, path)
+    except (OSError, ValueError):
+        return False
+    return True
+
+def drop(adir:str) -> bool:
+    """ Removes persisted validation results, if any. """
+    path = os.path.join(adir, VALID_NAME)
+    if not os.path.isfile(path):
+        return False
+    os.remove(path)
+    return True
+
+# Main script
+if __name__ == "__main__":
+    print("Please import me!")
@@ -4,11 +4,19 @@
 """
 
 # pylint: disable=missing-function-docstring
+from operator import itemgetter
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import jdba.jcommon
 from jdba.jcommon import overview
+from jdba.jrows import CompactCase
+from jdba.jfields import freeze
+from jdba.jrules import compile_rules, refs_of, check_rules
 
 DEBUG = 0
 
+FIELD_KINDS = ("u-id", "unique", "fields")
+
 class StrictSchema(jdba.jcommon.DataSchema):
     """ Strict database schemas
     """
@@ -18,71 +26,306 @@ class StrictSchema(jdba.jcommon.DataSchema):
         self._path = obj.name
         self._myself = obj
         self.inlist = inlist
+        self._plan = None	# (inlist, compiled plan)
+        self._checked = {}	# (tname, case, case Id): version token, when valid
 
     def boxes(self) -> list:
         return self._myself.dlist.get_case("boxes")
 
+    def schema_path(self) -> str:
+        return self._path
+
+    def box_refs(self) -> dict:
+        """ Returns the boxes referenced (foreign keys) by each box. """
+        res = {}
+        for tname, checks in self._compiled():
+            there = set()
+            for _, _, field_type, methods in checks:
+                if field_type == "fields":
+                    there.update(box for box, _ in refs_of(methods))
+            if there:
+                res[tname] = sorted(there)
+        return res
+
+    def unique_fields(self, tname:str, acase:str) -> list:
+        """ Returns the fields declared unique for box/case, as tuples:
+        ('Id',) for 'u-id', and one tuple per entry of 'unique' methods (UniqueFields),
+        see unique_specs().
+        """
+        res = []
+        for box in self.inlist:
+            if box["Key"] != tname:
+                continue
+            for ucase in box["UCases"]:
+                for dct in ucase:
+                    if dct["Key"] != acase:
+                        continue
+                    if dct["FieldType"] == "u-id":
+                        res.append(("Id",))
+                        continue
+                    if dct["FieldType"] != "unique":
+                        continue
+                    for methd in dct["Method"] if dct["Method"] else []:
+                        if methd["Id"] < 1:
+                            continue
+                        res += unique_specs(methd.get("UniqueFields") or [])
+        return res
+
     def saver(self):
         """ This is usually not needed, as it is task of the db manager.
         But for clarity, it is laid down here.
         """
         return self._myself.save(self._path)
 
-    def validate(self, ndexing, debug=DEBUG) -> str:
-        """ Returns an empty string if all ok. """
-        order = []
-        used = {}
-        box = None
+    def validate(self, ndexing, debug=DEBUG, cold=False, skip=()) -> str:
+        """ Returns an empty string if all ok.
+        :param cold: True to check all cases; otherwise cases are checked only
+            if they changed since their last successful validation.
+        :param skip: boxes known to be valid (e.g. cached, see jvalfile)
+        """
+        if cold:
+            self._plan = None
+        plan = self._compiled()
+        if not ndexing:
+            return "Nothing to validate"
+        msg = self._validate_ordr(ndexing, plan, debug, skip)
+        return msg
+
+    def _compiled(self) -> list:
+        """ Returns the validation plan, compiled again if the schema list changed. """
+        if self._plan is None or self._plan[0] is not self.inlist:
+            self._plan = (self.inlist, self.compile())
+            self._checked = {}
+        return self._plan[1]
+
+    def compile(self) -> list:
+        """ Returns the validation plan: for each box, (tname, checks),
+        each check being (case name, case Id, field type, method);
+        'fields' methods are compiled to rules (see jrules.compile_rules()).
+        """
+        plan = []
+        used = set()
         for box in self.inlist:
             an_id, tname, cases = box["Id"], box["Key"], box["UCases"]
             assert an_id >= 0, tname
             assert box["Title"], tname
-            #print(tname, cases); print()
-            order.append((tname, cases, box))
             assert tname not in used, tname
-            used[tname] = cases
-        if not ndexing:
-            return "Nothing to validate"
-        assert box is not None, f"StrictSchema(), box? {self._path}"
-        msg = self._validate_ordr(
-            (tname, cases, box, used),
-            ndexing, order,
-            debug
-        )
-        return msg
-
-    def _validate_ordr(self, tup:tuple, ndexing, order:list, debug):
-        assert isinstance(order, list)
-        tname, cases, box, used = tup
-        assert box, tname
-        if debug > 0:
-            print("::: validate_ordr():", overview(cases))
-        for tname, cases, box in order:
-            if debug > 0:
-                print(f"validate() tname={tname}, order is {overview(order)}")
-            dlist, _, ok_code = ndexing["tables"][tname]
-            if not ok_code:
-                return f"Faulty '{tname}'"
-            for acase in used[tname]:
+            used.add(tname)
+            checks = []
+            for acase in cases:
                 for idx, dct in enumerate(acase, 1):
-                    if debug > 0:
-                        print(
-                            f"validate() acase='{acase}' idx={idx}/{len(acase)}",
-                            dct,
-                        )
                     an_id, key, field_type = dct["Id"], dct["Key"], dct["FieldType"]
-                    infos = (tname, key, an_id, dct["Method"])
-                    #print("infos:", infos, "; an_id:", an_id, idx, field_type)
                     msg = f"Failed case={key}, field_type={field_type}, {idx}, got {an_id}"
                     assert an_id == idx, msg
-                    elems = dlist.get_case(key)
-                    msg = xvalidate_kinds(field_type, elems, infos)
-                    assert isinstance(msg, str)
-                    if msg:
-                        return f"case@{key} {msg}"
+                    assert field_type in FIELD_KINDS, f"Invalid FieldType: {field_type}"
+                    methods = dct["Method"]
+                    if field_type == "fields":
+                        methods = compile_rules(methods)
+                    checks.append((key, an_id, field_type, methods))
+            plan.append((tname, checks))
+        assert plan, f"StrictSchema(), box? {self._path}"
+        return plan
+
+    def _validate_ordr(self, ndexing, plan:list, debug, skip=()):
+        assert isinstance(plan, list)
+        for tname, checks in plan:
+            if debug > 0:
+                print(f"validate() tname={tname}, checks: {overview(checks)}")
+            if tname not in ndexing["tables"] or tname in skip:
+                continue
+            dlist, box, ok_code = ndexing["tables"][tname]
+            if not ok_code:
+                return f"Faulty '{tname}'"
+            for key, c_id, field_type, methods in checks:
+                infos = (tname, key, c_id, methods)
+                token = case_token(dlist, box, key)
+                if field_type == "fields":
+                    # Foreign keys: referenced cases are part of the version token
+                    token = ref_token(ndexing, methods, token)
+                if token is not None and self._checked.get(infos[:3]) == token:
+                    continue
+                refs = ref_ids(ndexing, methods) if field_type == "fields" else None
+                elems = dlist.get_case(key)
+                msg = xvalidate_kinds(field_type, elems, infos, refs)
+                assert isinstance(msg, str)
+                if msg:
+                    return f"case@{key} {msg}"
+                self._checked[infos[:3]] = token
         return ""
 
-def xvalidate_kinds(field_type, elems, infos) -> str:
+    def report(self, ndexing, workers:int=0, pool:str="process") -> list:
+        """ Validates all cases (concurrently, if workers > 0), and returns
+        all violations, ordered by box (schema order), case, field and Ids;
+        each violation is a dictionary: box, case, field, ids, message.
+        Checks are pure Python: only a 'process' pool runs them in parallel.
+        """
+        assert pool in ("thread", "process"), f"Invalid pool: {pool}"
+        res, units = [], []
+        for b_idx, (tname, checks) in enumerate(self._compiled()):
+            if tname not in ndexing["tables"]:
+                continue
+            dlist, _, ok_code = ndexing["tables"][tname]
+            if not ok_code:
+                res.append((b_idx, 0, new_violation(tname, "", "", [], f"Faulty '{tname}'")))
+                continue
+            for key, c_id, field_type, methods in checks:
+                elems = dlist.get_case(key)
+                if pool == "process" and isinstance(elems, CompactCase):
+                    elems = elems.unpacked()
+                refs = ref_ids(ndexing, methods) if field_type == "fields" else None
+                units.append(
+                    ((b_idx, c_id), field_type, elems, (tname, key, c_id, methods), refs)
+                )
+        if workers > 0 and len(units) > 1:
+            executor = ThreadPoolExecutor if pool == "thread" else ProcessPoolExecutor
+            with executor(max_workers=workers) as runner:
+                found = list(runner.map(check_unit, units))
+        else:
+            found = [check_unit(unit) for unit in units]
+        for (b_idx, c_id), violations in found:
+            res += [(b_idx, c_id, dct) for dct in violations]
+        res.sort(key=lambda tup: (
+            tup[0], tup[2]["case"], tup[1], tup[2]["field"], tup[2]["ids"], tup[2]["message"],
+        ))
+        return [tup[2] for tup in res]
+
+def check_unit(unit:tuple) -> tuple:
+    """ Runs one check; module-level, so that it can be used by process pools. """
+    where, field_type, elems, infos, refs = unit
+    tname, key, _, _ = infos
+    res = [
+        new_violation(tname, key, field, ids, msg)
+        for field, ids, msg in case_violations(field_type, elems, infos, refs)
+    ]
+    return where, res
+
+def new_violation(tname:str, key:str, field:str, ids:list, msg:str) -> dict:
+    return {
+        "box": tname,
+        "case": key,
+        "field": field,
+        "ids": ids,
+        "message": msg,
+    }
+
+def case_violations(field_type, elems, infos, refs=None) -> list:
+    """ Returns all violations of a case, as (field, ids, message) triplets. """
+    if not isinstance(elems, list):
+        return []
+    if field_type == "u-id":
+        return id_violations(elems)
+    if field_type == "fields":
+        return check_rules(elems, infos[3], refs if refs else {})
+    assert field_type == "unique", f"Invalid FieldType: {field_type}"
+    methods = infos[3]
+    if not methods:
+        msg = validate_uniqueness(elems, infos, 0)
+        return [("", [], msg)] if msg else []
+    res = []
+    for methd in methods:
+        if methd["Id"] < 1:
+            continue
+        specs = unique_specs(methd.get("UniqueFields") or [])
+        for spec, (dups, missing) in zip(specs, find_duplicates(elems, specs)):
+            name = "+".join(spec)
+            for key, items in dups.items():
+                ids = sorted(item["Id"] for item in items)
+                res.append((name, ids, f"Duplicate {name}={shown_key(key, spec)}"))
+            if missing:
+                res.append((name, missing, f"Missing {name}"))
+    return res
+
+def id_violations(elems) -> list:
+    seen, dups = set(), {}
+    for elem in elems:
+        an_id = elem["Id"]
+        if an_id in seen:
+            dups[an_id] = dups.get(an_id, 1) + 1
+        seen.add(an_id)
+    return [
+        ("Id", [an_id], f"Duplicate Id={an_id}, {dups[an_id]} records")
+        for an_id in sorted(dups)
+    ]
+
+def unique_specs(fields) -> list:
+    """ Returns UniqueFields entries as field tuples;
+    an entry is a field name, or a list of fields (composite key), e.g.
+	"UniqueFields": ["Title", ["Key", "Mark"]]
+    """
+    return [(field,) if isinstance(field, str) else tuple(field) for field in fields]
+
+def find_duplicates(elems, specs:list) -> list:
+    """ Checks all field tuples (specs) in a single pass over records (Id >= 1).
+    Returns, for each spec, a pair:
+	- duplicate keys (a value, or a tuple of values for composite specs):
+	  the records with that key, in list order (keys ordered by their first duplicate);
+	- Ids of records missing any of the spec fields.
+    """
+    slots = [(itemgetter(*spec), {}, {}, []) for spec in specs]
+    for item in elems:
+        an_id = item["Id"]
+        if an_id < 1:
+            continue
+        for getter, seen, dups, missing in slots:
+            try:
+                key = getter(item)
+                there = seen.setdefault(key, item)
+            except KeyError:
+                missing.append(an_id)
+                continue
+            except TypeError:
+                # Unhashable values (lists, dictionaries)
+                key = freeze(list(key)) if isinstance(key, tuple) else freeze(key)
+                there = seen.setdefault(key, item)
+            if there is not item:
+                dups.setdefault(key, [there]).append(item)
+    return [(dups, missing) for _, _, dups, missing in slots]
+
+def shown_key(key, spec:tuple) -> str:
+    if len(spec) == 1:
+        return f"'{key}'"
+    return str(key)
+
+def case_token(dlist, box, name:str):
+    """ Returns the version token of a case (see JBox.case_version()), or None. """
+    if not hasattr(box, "case_version"):
+        return None
+    key, _, _ = dlist.get_case_root(name)
+    return (id(dlist), box.case_version(key))
+
+def ref_ids(ndexing, rules:tuple) -> dict:
+    """ Returns the Ids of cases referenced by foreign keys, by (box, case);
+    boxes not being validated (not in ndexing) are left out.
+    """
+    res = {}
+    for tname, acase in refs_of(rules):
+        if tname not in ndexing["tables"]:
+            continue
+        dlist = ndexing["tables"][tname][0]
+        dlist.get_case_root(acase)
+        where = dlist.index.where_ids(acase)
+        if not where:
+            elems = dlist.get_case(acase)
+            where = {item["Id"] for item in elems} if isinstance(elems, list) else set()
+        res[(tname, acase)] = where
+    return res
+
+def ref_token(ndexing, rules:tuple, token):
+    """ Returns the version token of a case, together with those of its references. """
+    if token is None:
+        return None
+    res = [token]
+    for tname, acase in refs_of(rules):
+        if tname not in ndexing["tables"]:
+            continue
+        dlist, box, _ = ndexing["tables"][tname]
+        there = case_token(dlist, box, acase)
+        if there is None:
+            return None
+        res.append(there)
+    return tuple(res)
+
+def xvalidate_kinds(field_type, elems, infos, refs=None) -> str:
     """ Returns an empty string if basic check succeeded. """
     if not isinstance(elems, list):
         return ""
@@ -90,10 +333,23 @@ def xvalidate_kinds(field_type, elems, infos) -> str:
         msg = validate_unique_id(elems, infos)
     elif field_type == "unique":
         msg = validate_uniqueness(elems, infos, 0)
+    elif field_type == "fields":
+        msg = validate_fields(elems, infos, refs if refs else {})
     else:
         assert False, f"Invalid FieldType: {field_type}"
     return msg
 
+def validate_fields(elems, infos, refs:dict) -> str:
+    """ Validate field types and constraints, all rules in a single pass """
+    found = check_rules(elems, infos[3], refs)
+    if not found:
+        return ""
+    _, ids, msg = found[0]
+    num = sum(len(there) for _, there, _ in found)
+    if num > 1:
+        return f"{num} violations with {infos[1]}, first: {msg} ({ids[0]})"
+    return f"{msg} ({ids[0]})"
+
 def validate_unique_id(elems, infos) -> str:
     ids = {}
     for elem in elems:
@@ -129,14 +385,23 @@ def validate_uniqueness(elems, infos, depth, debug=DEBUG) -> str:
         return ""
     if len(elems) == 1:
         return validate_uniqueness(elems[0], infos, depth+1)
-    for idx, elem in enumerate(sorted(elems), 1):
-        #print("idx:", idx, elem)
-        if elem in ids:
-            there = ids[elem]
+    for idx, elem in enumerate(elems, 1):
+        key = canonical(elem)
+        if key in ids:
+            there = ids[key]
             return f"Duplicate field idx={idx} {infos}: <<{there}>>"
-        ids[elem] = idx
+        ids[key] = idx
     return ""
 
+def canonical(elem):
+    """ Returns a hashable equivalent of an element (records included) """
+    if isinstance(elem, Mapping):
+        try:
+            return frozenset(elem.items())
+        except TypeError:
+            return freeze(dict(elem))
+    return freeze(elem)
+
 def methods_validate(elems, infos, methods, depth, m_str) -> str:
     """ Before calling micro_validate() """
     assert m_str
@@ -157,41 +422,34 @@ def methods_validate(elems, infos, methods, depth, m_str) -> str:
     return ""
 
 def validate_fields_uq(elems, quad, fields):
-    """ Validate field(s) uniqueness
+    """ Validate field(s) uniqueness, all fields (or field tuples) in a single pass
     """
     _, acase, _, _ = quad
     assert acase
-    for field in fields:
-        msg = micro_validate(elems, acase, field)
+    specs = unique_specs(fields)
+    for spec, (dups, _) in zip(specs, find_duplicates(elems, specs)):
+        msg = duplicates_msg(acase, spec, dups)
         if msg:
             return msg
     return ""
 
 def micro_validate(elems, acase, field):
-    #print("VALIDATE:", acase, "; field:", field)
-    msgs = []
-    used = {}
-    for item in elems:
-        an_id = item["Id"]
-        if an_id < 1:
-            continue
-        hint = f" ({an_id})"
-        fld_val = item[field]
-        if fld_val in used:
-            #print("Already used:", item, "; by:", used[fld_val])
-            msg = f"Duplicate {field}='{fld_val}'{hint}; {used[fld_val]}"
-            msgs.append(msg)
-        else:
-            used[fld_val] = item
-    #for key in sorted(used):
-    #    print(f":::# {acase}.{field} key={key}, as: {used[key]}")
-    if len(msgs) > 1:
-        msg = f"{len(msgs)} dups with {acase}.{field}, first: {msgs[0]}"
-        return msg
-    if msgs:
-        msg = msgs[0]
-        return msg
-    return ""
+    """ Validate uniqueness of one field (or tuple of fields) """
+    spec = unique_specs([field])[0]
+    dups, _ = find_duplicates(elems, [spec])[0]
+    return duplicates_msg(acase, spec, dups)
+
+def duplicates_msg(acase, spec:tuple, dups:dict) -> str:
+    """ Returns the message of the first duplicate (in list order), if any. """
+    if not dups:
+        return ""
+    name = "+".join(spec)
+    key, items = next(iter(dups.items()))
+    msg = f"Duplicate {name}={shown_key(key, spec)} ({items[1]['Id']}); {items[0]}"
+    num = sum(len(items) - 1 for items in dups.values())
+    if num > 1:
+        return f"{num} dups with {acase}.{name}, first: {msg}"
+    return msg
 
 def validate_dict_keying(elems:dict, infos):
     """ Dictionary has, by nature, unique keys.